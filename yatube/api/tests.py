@@ -0,0 +1,138 @@
+import warnings
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.posts = [Post.objects.create(author=cls.author, group=cls.group,
+                                         text=f'Пост {num}')
+                     for num in range(5)]
+        Comment.objects.create(post=cls.posts[0], author=cls.reader,
+                               text='Комментарий')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def collect(self, client, url):
+        """Проходит ленту по курсорам next и собирает id постов."""
+        ids, query = [], {'limit': 2}
+        while True:
+            data = client.get(url, query).json()
+            ids += [post['id'] for post in data['results']]
+            if data['next'] is None:
+                return ids
+            query['after'] = data['next']
+
+    def test_feeds_are_paged_by_cursor(self):
+        """Ленты API листаются по курсору от новых постов к старым"""
+        expected = [post.id for post in reversed(self.posts)]
+        for url in (reverse('api:post_list'),
+                    reverse('api:group_feed', kwargs={'slug': 'group'}),
+                    reverse('api:author_feed',
+                            kwargs={'username': 'author'})):
+            with self.subTest(url=url):
+                self.assertEqual(self.collect(self.guest_client, url),
+                                 expected)
+
+    def test_compact_post_representation(self):
+        """Пост отдаётся компактным JSON с постоянным набором ключей"""
+        response = self.guest_client.get(reverse('api:post_list'),
+                                         {'limit': 1})
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertNotIn(b', ', response.content)
+        post = response.json()['results'][0]
+        self.assertEqual(list(post), ['id', 'author', 'group', 'pub_date',
+                                      'text', 'image', 'comments_count'])
+        self.assertEqual(post['text'], 'Пост 4')
+        self.assertEqual(post['group'], 'group')
+
+    def test_list_needs_one_query(self):
+        """Лента читается одним запросом без объектов моделей"""
+        with self.assertNumQueries(1):
+            self.guest_client.get(reverse('api:post_list'))
+
+    def test_logged_in_within_budget(self):
+        """Пользователю ленты отдаются в пределах бюджета запросов"""
+        urls = (
+            reverse('api:post_list'),
+            reverse('api:post_item', kwargs={'post_id': self.posts[0].id}),
+            reverse('api:group_feed', kwargs={'slug': self.group.slug}),
+            reverse('api:author_feed',
+                    kwargs={'username': self.author.username}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                cache.clear()
+                response = self.reader_client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+    def test_post_item_with_comments(self):
+        """Пост отдаётся вместе с комментариями"""
+        response = self.guest_client.get(
+            reverse('api:post_item', kwargs={'post_id': self.posts[0].id}))
+        data = response.json()
+        self.assertEqual(data['comments_count'], 1)
+        self.assertEqual([comment['text'] for comment in data['comments']],
+                         ['Комментарий'])
+
+    @override_settings(COMMENTS_PER_PAGE=2)
+    def test_post_item_pages_comments(self):
+        """Комментарии поста отдаются страницами по курсору"""
+        post = self.posts[1]
+        for num in range(5):
+            Comment.objects.create(post=post, author=self.author,
+                                   text=f'Комментарий {num}')
+        url = reverse('api:post_item', kwargs={'post_id': post.id})
+        texts, data = [], {'comments_next': ''}
+        while data['comments_next'] is not None:
+            with warnings.catch_warnings():
+                warnings.simplefilter('error')
+                data = self.guest_client.get(
+                    url, {'after': data['comments_next']}).json()
+            self.assertLessEqual(len(data['comments']), 2)
+            texts += [comment['text'] for comment in data['comments']]
+        self.assertEqual(texts, [f'Комментарий {num}'
+                                 for num in range(4, -1, -1)])
+        self.assertIsNotNone(data['comments_previous'])
+
+    def test_missing_objects(self):
+        """Несуществующие объекты дают 404 в JSON"""
+        for url in (reverse('api:post_item', kwargs={'post_id': 999}),
+                    reverse('api:group_feed', kwargs={'slug': 'missing'}),
+                    reverse('api:author_feed',
+                            kwargs={'username': 'missing'})):
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, 404)
+                self.assertIn('detail', response.json())
+
+    def test_api_is_read_only(self):
+        """Изменять данные через API нельзя"""
+        response = self.reader_client.post(reverse('api:post_list'))
+        self.assertEqual(response.status_code, 405)
+
+    @override_settings(FEED_PULL_FOLLOWER_THRESHOLD=0)
+    def test_follow_feed(self):
+        """Лента подписок доступна только пользователю"""
+        url = reverse('api:follow_feed')
+        self.assertEqual(self.guest_client.get(url).status_code, 401)
+        self.assertEqual(self.collect(self.reader_client, url), [])
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.collect(self.reader_client, url),
+                         [post.id for post in reversed(self.posts)])
@@ -0,0 +1,15 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'api'
+
+urlpatterns = [
+    path('posts/', views.post_list, name='post_list'),
+    path('posts/<int:post_id>/', views.post_item, name='post_item'),
+    path('groups/<slug:slug>/posts/', views.group_feed, name='group_feed'),
+    path('authors/<str:username>/posts/', views.author_feed,
+         name='author_feed'),
+    path('follow/', views.follow_feed, name='follow_feed'),
+    path('export/<str:kind>/', views.export_data, name='export'),
+]
@@ -0,0 +1,167 @@
+"""
+ Программный интерфейс лент только для чтения.
+
+ Записи выбираются через values() без создания объектов моделей,
+ ленты листаются по курсору (?after=, ?before=, ?limit=), ответ —
+ компактный JSON с постоянным набором и порядком ключей. Ответы
+ кэшируются и проверяются по ETag так же, как HTML-страницы
+ (см. posts/page_cache.py).
+"""
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.http import require_safe
+
+from posts import export, feeds, page_cache
+from posts.models import Comment, Group, Post, User
+from posts.paginators import CursorPaginator, MergedCursorPaginator
+
+POST_FIELDS = ('id', 'text', 'pub_date', 'image', 'comments_count',
+               'author__username', 'group__slug')
+COMMENT_FIELDS = ('id', 'text', 'created', 'author__username')
+
+image_storage = Post._meta.get_field('image').storage
+
+
+def json_response(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params={
+        'ensure_ascii': False, 'separators': (',', ':')})
+
+
+def not_found():
+    return json_response({'detail': 'Не найдено'}, status=404)
+
+
+def serialize_post(row):
+    return {
+        'id': row['id'],
+        'author': row['author__username'],
+        'group': row['group__slug'],
+        'pub_date': row['pub_date'],
+        'text': row['text'],
+        'image': image_storage.url(row['image']) if row['image'] else None,
+        'comments_count': row['comments_count'],
+    }
+
+
+def serialize_comment(row):
+    return {
+        'id': row['id'],
+        'author': row['author__username'],
+        'created': row['created'],
+        'text': row['text'],
+    }
+
+
+def page_size(request, default=None):
+    default = default or settings.POST_PER_PAGE
+    try:
+        limit = int(request.GET.get('limit', default))
+    except ValueError:
+        limit = default
+    return min(max(limit, 1), settings.API_MAX_PAGE_SIZE)
+
+
+def feed_response(request, sources, key=('pub_date', 'id')):
+    """Страница ленты по курсору из одного или нескольких источников."""
+    if len(sources) > 1:
+        paginator = MergedCursorPaginator(sources, page_size(request),
+                                          key=key)
+    else:
+        paginator = CursorPaginator(sources[0], page_size(request), key=key)
+    page = paginator.get_cursor_page(after=request.GET.get('after'),
+                                     before=request.GET.get('before'))
+    page_cache.depends_on_posts(request, page)
+    return json_response({
+        'results': [serialize_post(row) for row in page],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    })
+
+
+@require_safe
+@page_cache.versioned_cache_page
+def post_list(request):
+    page_cache.depends_on(request, page_cache.ALL_POSTS_SCOPE,
+                          page_cache.GROUPS_SCOPE, page_cache.USERS_SCOPE)
+    return feed_response(request, [Post.objects.values(*POST_FIELDS)])
+
+
+@require_safe
+@page_cache.versioned_cache_page
+def group_feed(request, slug):
+    page_cache.depends_on(request, page_cache.USERS_SCOPE)
+    group_id = (Group.objects.filter(slug=slug)
+                .values_list('id', flat=True).first())
+    if group_id is None:
+        return not_found()
+    page_cache.depends_on(request, page_cache.group_scope(group_id))
+    return feed_response(
+        request, [Post.objects.filter(group_id=group_id)
+                  .values(*POST_FIELDS)])
+
+
+@require_safe
+@page_cache.versioned_cache_page
+def author_feed(request, username):
+    page_cache.depends_on(request, page_cache.GROUPS_SCOPE,
+                          page_cache.USERS_SCOPE)
+    author_id = (User.objects.filter(username=username)
+                 .values_list('id', flat=True).first())
+    if author_id is None:
+        return not_found()
+    page_cache.depends_on(request, page_cache.author_scope(author_id))
+    return feed_response(
+        request, [Post.objects.filter(author_id=author_id)
+                  .values(*POST_FIELDS)])
+
+
+@require_safe
+@page_cache.versioned_cache_page
+def post_item(request, post_id):
+    page_cache.depends_on(request, page_cache.post_scope(post_id),
+                          page_cache.GROUPS_SCOPE, page_cache.USERS_SCOPE)
+    row = Post.objects.filter(id=post_id).values(*POST_FIELDS).first()
+    if row is None:
+        return not_found()
+    # Комментарии от новых к старым страницами по курсору, как на
+    # странице поста: у популярного поста их может быть очень много
+    paginator = CursorPaginator(
+        Comment.objects.filter(post_id=post_id).values(*COMMENT_FIELDS)
+        .order_by('-created', '-id'),
+        page_size(request, settings.COMMENTS_PER_PAGE),
+        key=('created', 'id'))
+    comments = paginator.get_cursor_page(after=request.GET.get('after'),
+                                         before=request.GET.get('before'))
+    return json_response(dict(
+        serialize_post(row),
+        comments=[serialize_comment(comment) for comment in comments],
+        comments_next=comments.next_cursor,
+        comments_previous=comments.previous_cursor))
+
+
+@require_safe
+def follow_feed(request):
+    if not request.user.is_authenticated:
+        return json_response({'detail': 'Нужна авторизация'}, status=401)
+    sources = [source.values(*POST_FIELDS, *feeds.CURSOR_KEY)
+               for source in feeds.user_feed(request.user)]
+    return feed_response(request, sources, key=feeds.CURSOR_KEY)
+
+
+@require_safe
+def export_data(request, kind):
+    """Потоковая выгрузка для персонала; параметры как у export_data."""
+    if not request.user.is_staff:
+        return json_response({'detail': 'Только для персонала'},
+                             status=403)
+    export_format = request.GET.get('format', 'ndjson')
+    if export_format not in export.FORMATS:
+        return json_response({'detail': 'Неизвестный формат'}, status=400)
+    try:
+        records = export.queryset(
+            kind, **{name: request.GET.get(name)
+                     for name in ('author', 'group', 'since', 'until')})
+    except export.ExportError as error:
+        return json_response({'detail': str(error)}, status=400)
+    return export.response(records, kind, export_format)
@@ -0,0 +1,63 @@
+import re
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from . import metrics
+
+KEY_SEPARATOR_RE = re.compile(r'[:|]+')
+CACHE_PAGE_PREFIX = 'views.decorators.cache.'
+
+
+def keyspace(key):
+    """Группа ключа для метрик: 'cache_page.index_page', 'posts:count'."""
+    if key.startswith(CACHE_PAGE_PREFIX):
+        return '.'.join(key[len(CACHE_PAGE_PREFIX):].split('.')[:2])
+    parts = [part for part in KEY_SEPARATOR_RE.split(key) if part]
+    return ':'.join(parts[:2])
+
+
+class InstrumentedCacheMixin:
+    """
+    Считает попадания и промахи кэша по группам ключей.
+
+    get_many у LocMemCache и FileBasedCache выполняется через get,
+    поэтому отдельно не переопределяется.
+    """
+
+    def get(self, key, default=None, version=None):
+        sentinel = object()
+        value = super().get(key, sentinel, version=version)
+        metrics.count_cache_request(keyspace(key), value is not sentinel)
+        return default if value is sentinel else value
+
+
+class InstrumentedLocMemCache(InstrumentedCacheMixin, LocMemCache):
+    pass
+
+
+class InstrumentedFileBasedCache(InstrumentedCacheMixin, FileBasedCache):
+    pass
+
+
+def is_shared(backend=None):
+    """Видят ли записи кэша все процессы сервера."""
+    backend = backend or caches[DEFAULT_CACHE_ALIAS]
+    return not isinstance(backend, LocMemCache)
+
+
+def shared_timeout(timeout, backend=None):
+    """
+    Срок хранения записи, сброс которой должны увидеть все процессы.
+
+    У LocMemCache в каждом процессе своя копия, и сброс в одном
+    процессе не виден в остальных, поэтому срок ограничивается
+    LOCAL_CACHE_TIMEOUT.
+    """
+    if is_shared(backend):
+        return timeout
+    if timeout is None:
+        return settings.LOCAL_CACHE_TIMEOUT
+    return min(timeout, settings.LOCAL_CACHE_TIMEOUT)
@@ -0,0 +1,16 @@
+from django.core.checks import Tags, Warning, register
+
+from .cache import is_shared
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Версии страниц и счётчики лент должны быть общими для процессов."""
+    if is_shared():
+        return []
+    return [Warning(
+        'Кэш по умолчанию хранится в памяти процесса: сбросы страниц и '
+        'счётчиков не видны другим процессам.',
+        hint='Укажите общий кэш, например каталог YATUBE_CACHE_DIR.',
+        id='core.W001',
+    )]
@@ -0,0 +1,131 @@
+"""
+ Чтение с реплик.
+
+ Записи всегда идут в основную базу default. Читать с реплик
+ (REPLICA_DATABASES) могут только GET- и HEAD-запросы к представлениям
+ REPLICA_VIEWS — лентам, профилю и странице поста; остальные запросы,
+ команды и фоновые задачи читают из default. Реплика выбирается одна
+ на запрос, а после первой записи запрос до конца читает из default.
+
+ Запрос, который что-то записал, ставит cookie REPLICA_PIN_COOKIE на
+ REPLICA_STICKY_SECONDS секунд: пока она есть, пользователь читает из
+ default и видит свои изменения, даже если реплики их ещё не получили.
+
+ Задержка реплики — возраст метки ReplicationHeartbeat на ней; метку
+ пишет в default команда sync_replicas. Реплика без метки или отстающая
+ больше REPLICA_MAX_LAG секунд не используется. Задержка проверяется не
+ чаще раза в REPLICA_LAG_CHECK_INTERVAL секунд и отдаётся метрикой
+ yatube_replica_lag_seconds.
+"""
+
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError
+from django.utils import timezone
+
+from . import metrics
+from .models import ReplicationHeartbeat
+
+_state = ContextVar('replica_routing', default=None)
+_freshness = {}
+
+
+class RoutingState:
+    """Маршрутизация чтений одного запроса."""
+
+    def __init__(self):
+        self.use_replicas = False
+        self.wrote = False
+        self.replica = None
+        self.freshness = None
+
+
+def activate():
+    state = RoutingState()
+    return state, _state.set(state)
+
+
+def deactivate(token):
+    _state.reset(token)
+
+
+def beat(using=DEFAULT_DB_ALIAS):
+    """Обновляет метку репликации в базе using."""
+    ReplicationHeartbeat.objects.using(using).update_or_create(
+        pk=1, defaults={'beat': timezone.now()})
+
+
+def replica_freshness(alias):
+    """
+    Время метки репликации на реплике alias (timestamp) или None.
+
+    Данные реплики не старше этого времени. Результат проверки
+    запоминается на REPLICA_LAG_CHECK_INTERVAL секунд.
+    """
+    checked = _freshness.get(alias)
+    now = time.monotonic()
+    if (checked is not None
+            and now - checked[0] < settings.REPLICA_LAG_CHECK_INTERVAL):
+        return checked[1]
+    try:
+        heartbeat = (ReplicationHeartbeat.objects.using(alias)
+                     .values_list('beat', flat=True).first())
+    except DatabaseError:
+        heartbeat = None
+    freshness = heartbeat.timestamp() if heartbeat is not None else None
+    _freshness[alias] = (now, freshness)
+    if freshness is not None:
+        metrics.set_replica_lag(alias, max(time.time() - freshness, 0))
+    return freshness
+
+
+def choose_replica():
+    """Случайная реплика с допустимой задержкой: (alias, время данных)."""
+    now = time.time()
+    candidates = []
+    for alias in settings.REPLICA_DATABASES:
+        freshness = replica_freshness(alias)
+        if (freshness is not None
+                and now - freshness <= settings.REPLICA_MAX_LAG):
+            candidates.append((alias, freshness))
+    if not candidates:
+        return DEFAULT_DB_ALIAS, None
+    return random.choice(candidates)
+
+
+def read_freshness():
+    """Время данных реплики, с которой читал запрос; None — читал default."""
+    state = _state.get()
+    return state.freshness if state is not None else None
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not state.use_replicas or state.wrote:
+            return DEFAULT_DB_ALIAS
+        if state.replica is None:
+            state.replica, state.freshness = choose_replica()
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # В репликах те же данные, что и в default
+        databases = {DEFAULT_DB_ALIAS, *settings.REPLICA_DATABASES}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплики получают схему вместе с данными
+        if db in settings.REPLICA_DATABASES:
+            return False
+        return None
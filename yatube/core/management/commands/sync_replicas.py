@@ -0,0 +1,42 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core import db_router
+
+
+class Command(BaseCommand):
+    help = ('Обновляет метку репликации и копирует основную базу SQLite '
+            'в файлы реплик REPLICA_DATABASES')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--heartbeat-only', action='store_true',
+                            help='Только обновить метку: реплики '
+                                 'заполняются внешней репликацией')
+
+    def handle(self, *args, **options):
+        db_router.beat()
+        if options['heartbeat_only']:
+            self.stdout.write(self.style.SUCCESS('Метка обновлена'))
+            return
+        if not settings.REPLICA_DATABASES:
+            raise CommandError('Реплики не настроены: YATUBE_REPLICAS')
+        source = connections[DEFAULT_DB_ALIAS]
+        if source.vendor != 'sqlite':
+            raise CommandError('Копировать можно только базу SQLite')
+        source.ensure_connection()
+        for alias in settings.REPLICA_DATABASES:
+            replica = connections[alias]
+            if replica.vendor != 'sqlite':
+                raise CommandError(f'Реплика {alias} не в SQLite')
+            replica.close()
+            target = sqlite3.connect(replica.settings_dict['NAME'])
+            try:
+                source.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(f'{alias}: {replica.settings_dict["NAME"]}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Скопировано реплик: {len(settings.REPLICA_DATABASES)}'))
@@ -0,0 +1,276 @@
+"""
+ Метрики производительности в формате Prometheus.
+
+ Каждый процесс копит счётчики, значения (gauge) и гистограммы в памяти
+ (REGISTRY) и не чаще раза в METRICS_FLUSH_INTERVAL секунд сбрасывает
+ снимок в файл METRICS_DIR/<pid>.json. Страница /metrics/ складывает
+ снимки всех процессов; без METRICS_DIR отдаются метрики только
+ текущего процесса.
+
+ Снимок завершившегося процесса, как в multiprocess-режиме
+ prometheus_client, не копится в каталоге: его счётчики и гистограммы
+ добавляются в archive.json, значения (gauge) отбрасываются, а файл
+ удаляется. Так же поступает процесс, получивший PID прежнего: без
+ этого счётчики сбросились бы при перезаписи файла.
+"""
+
+import fcntl
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+ARCHIVE_NAME = 'archive.json'
+LOCK_NAME = '.lock'
+
+METRICS = {
+    'yatube_request_duration_seconds': (
+        'histogram', 'Время обработки запроса по представлениям'),
+    'yatube_db_queries': (
+        'histogram', 'Количество SQL-запросов на запрос'),
+    'yatube_db_query_duration_seconds_total': (
+        'counter', 'Суммарное время SQL-запросов'),
+    'yatube_template_render_seconds': (
+        'histogram', 'Время отрисовки шаблонов'),
+    'yatube_cache_requests_total': (
+        'counter', 'Обращения к кэшу по результату (hit/miss)'),
+    'yatube_replica_reads_total': (
+        'counter', 'Запросы, читавшие с реплики'),
+    'yatube_replica_lag_seconds': (
+        'gauge', 'Задержка реплики по последней проверке'),
+}
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._owner_pid = None
+        self.counters = defaultdict(float)
+        self.gauges = {}
+        self.histograms = {}
+
+    def inc(self, name, labels, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] += value
+
+    def set(self, name, labels, value):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.gauges[key] = value
+
+    def observe(self, name, labels, value, buckets=LATENCY_BUCKETS):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {
+                    'buckets': list(buckets),
+                    'counts': [0] * len(buckets),
+                    'sum': 0.0,
+                    'count': 0,
+                }
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram['counts'][index] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': [[name, list(labels), value] for
+                             (name, labels), value in self.counters.items()],
+                'gauges': [[name, list(labels), value] for
+                           (name, labels), value in self.gauges.items()],
+                'histograms': [[name, list(labels), dict(histogram,
+                                counts=list(histogram['counts']))]
+                               for (name, labels), histogram
+                               in self.histograms.items()],
+            }
+
+    def flush(self, force=False):
+        """Сохраняет снимок процесса в METRICS_DIR, если пора."""
+        directory = settings.METRICS_DIR
+        now = time.monotonic()
+        if directory is None or (
+                not force
+                and now - self._last_flush < settings.METRICS_FLUSH_INTERVAL):
+            return
+        self._last_flush = now
+        os.makedirs(directory, exist_ok=True)
+        pid = os.getpid()
+        path = os.path.join(directory, f'{pid}.json')
+        if self._owner_pid != pid:
+            # Файл с нашим PID остался от завершившегося процесса
+            with _locked(directory):
+                _archive(directory, path)
+            self._owner_pid = pid
+        _write_json(path, self.snapshot())
+
+
+REGISTRY = Registry()
+
+
+def _write_json(path, data):
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'w') as file:
+        json.dump(data, file)
+    os.replace(temp_path, path)
+
+
+def _read_json(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+@contextmanager
+def _locked(directory):
+    """Блокировка каталога снимков между процессами."""
+    with open(os.path.join(directory, LOCK_NAME), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def _archive(directory, path):
+    """
+    Переносит счётчики и гистограммы снимка path в archive.json и
+    удаляет снимок. Вызывается под блокировкой каталога.
+    """
+    snapshot = _read_json(path)
+    if snapshot is None:
+        return
+    archive_path = os.path.join(directory, ARCHIVE_NAME)
+    snapshots = [dict(snapshot, gauges=[])]
+    archive = _read_json(archive_path)
+    if archive is not None:
+        snapshots.append(archive)
+    _write_json(archive_path, merge_snapshots(snapshots).snapshot())
+    os.remove(path)
+
+
+def _load_snapshots():
+    directory = settings.METRICS_DIR
+    if directory is None or not os.path.isdir(directory):
+        return [REGISTRY.snapshot()]
+    REGISTRY.flush(force=True)
+    with _locked(directory):
+        names = [name for name in os.listdir(directory)
+                 if name.endswith('.json')]
+        for name in names:
+            pid = name[:-len('.json')]
+            if pid.isdigit() and not _is_alive(int(pid)):
+                _archive(directory, os.path.join(directory, name))
+        snapshots = [_read_json(os.path.join(directory, name))
+                     for name in os.listdir(directory)
+                     if name.endswith('.json')]
+    return [snapshot for snapshot in snapshots if snapshot is not None]
+
+
+def merge_snapshots(snapshots):
+    """Складывает снимки процессов в один; из значений — наибольшее."""
+    merged = Registry()
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            merged.counters[(name, tuple(map(tuple, labels)))] += value
+        for name, labels, value in snapshot.get('gauges', ()):
+            key = (name, tuple(map(tuple, labels)))
+            merged.gauges[key] = max(merged.gauges.get(key, value), value)
+        for name, labels, histogram in snapshot['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            total = merged.histograms.setdefault(key, {
+                'buckets': histogram['buckets'],
+                'counts': [0] * len(histogram['buckets']),
+                'sum': 0.0,
+                'count': 0,
+            })
+            for index, count in enumerate(histogram['counts']):
+                total['counts'][index] += count
+            total['sum'] += histogram['sum']
+            total['count'] += histogram['count']
+    return merged
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    body = ','.join('{}="{}"'.format(
+        name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+        for name, value in pairs)
+    return '{' + body + '}'
+
+
+def render_metrics():
+    """Метрики всех процессов в текстовом формате Prometheus."""
+    registry = merge_snapshots(_load_snapshots())
+    series = defaultdict(list)
+    for (name, labels), value in sorted(registry.counters.items()):
+        series[name].append(f'{name}{_format_labels(labels)} {value}')
+    for (name, labels), value in sorted(registry.gauges.items()):
+        series[name].append(f'{name}{_format_labels(labels)} {value}')
+    for (name, labels), histogram in sorted(registry.histograms.items()):
+        for bound, count in zip(histogram['buckets'], histogram['counts']):
+            series[name].append('{}_bucket{} {}'.format(
+                name, _format_labels(labels, [('le', bound)]), count))
+        series[name].append('{}_bucket{} {}'.format(
+            name, _format_labels(labels, [('le', '+Inf')]),
+            histogram['count']))
+        series[name].append(
+            f'{name}_sum{_format_labels(labels)} {histogram["sum"]}')
+        series[name].append(
+            f'{name}_count{_format_labels(labels)} {histogram["count"]}')
+    lines = []
+    for name, (kind, description) in METRICS.items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind}')
+        lines.extend(series.get(name, ()))
+    return '\n'.join(lines) + '\n'
+
+
+def observe_request(view_name, duration, recorder):
+    labels = {'view': view_name}
+    REGISTRY.observe('yatube_request_duration_seconds', labels, duration)
+    REGISTRY.observe('yatube_db_queries', labels, recorder.count,
+                     QUERY_BUCKETS)
+    REGISTRY.inc('yatube_db_query_duration_seconds_total', labels,
+                 recorder.duration)
+    REGISTRY.flush()
+
+
+def observe_template(template_name, duration):
+    REGISTRY.observe('yatube_template_render_seconds',
+                     {'template': template_name}, duration)
+
+
+def count_cache_request(keyspace, hit):
+    REGISTRY.inc('yatube_cache_requests_total',
+                 {'keyspace': keyspace, 'result': 'hit' if hit else 'miss'})
+
+
+def count_replica_read(database):
+    REGISTRY.inc('yatube_replica_reads_total', {'database': database})
+
+
+def set_replica_lag(database, lag):
+    REGISTRY.set('yatube_replica_lag_seconds', {'database': database}, lag)
@@ -0,0 +1,75 @@
+import time
+
+from django.conf import settings
+
+from . import db_router, metrics
+from .query_budget import check_budget, record_queries
+
+
+class QueryBudgetMiddleware:
+    """Проверяет бюджет SQL-запросов для каждого представления."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with record_queries() as recorder:
+            response = self.get_response(request)
+        match = request.resolver_match
+        if match is not None:
+            check_budget(match.view_name, recorder, request.method)
+        return response
+
+
+class MetricsMiddleware:
+    """Собирает время ответа и SQL-запросы по представлениям."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        with record_queries() as recorder:
+            response = self.get_response(request)
+        match = request.resolver_match
+        view_name = match.view_name if match is not None else '<unresolved>'
+        metrics.observe_request(view_name, time.perf_counter() - start,
+                                recorder)
+        return response
+
+
+class ReplicaMiddleware:
+    """
+    Направляет чтения запроса на реплику (см. core/db_router.py).
+
+    Стоит до SessionMiddleware, чтобы запись сессии тоже закрепляла
+    пользователя за основной базой.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.REPLICA_DATABASES:
+            return self.get_response(request)
+        state, token = db_router.activate()
+        request.replica_routing = state
+        try:
+            response = self.get_response(request)
+        finally:
+            db_router.deactivate(token)
+        if state.freshness is not None:
+            metrics.count_replica_read(state.replica)
+        if state.wrote:
+            response.set_cookie(settings.REPLICA_PIN_COOKIE, '1',
+                                max_age=settings.REPLICA_STICKY_SECONDS,
+                                httponly=True, samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = getattr(request, 'replica_routing', None)
+        if state is not None:
+            state.use_replicas = (
+                request.method in ('GET', 'HEAD')
+                and request.resolver_match.view_name in settings.REPLICA_VIEWS
+                and settings.REPLICA_PIN_COOKIE not in request.COOKIES)
@@ -0,0 +1,11 @@
+from django.db import models
+
+
+class ReplicationHeartbeat(models.Model):
+    """
+    Метка времени в основной базе (одна запись).
+
+    Реплика получает её вместе с данными, поэтому по метке на реплике
+    видно, насколько она отстаёт (см. core/db_router.py).
+    """
+    beat = models.DateTimeField()
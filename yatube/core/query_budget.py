@@ -0,0 +1,112 @@
+"""
+ Учёт SQL-запросов по представлениям.
+
+ QueryRecorder подключается к соединениям через execute_wrapper и
+ запоминает каждый запрос. По записи проверяется бюджет запросов
+ представления (QUERY_BUDGETS) и ищутся повторяющиеся запросы
+ одинаковой формы — признак N+1.
+"""
+
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+IN_LIST_RE = re.compile(r'\((?:%s, )+%s\)')
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def normalize_sql(sql):
+    """Форма запроса: списки IN любой длины сводятся к одному виду."""
+    return IN_LIST_RE.sub('(%s, ...)', sql)
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def duration(self):
+        return sum(duration for _, duration in self.queries)
+
+    def repeated_shapes(self, threshold):
+        """Формы запросов, выполненных не меньше threshold раз."""
+        shapes = Counter(normalize_sql(sql) for sql, _ in self.queries)
+        return {shape: total for shape, total in shapes.items()
+                if total >= threshold}
+
+
+@contextmanager
+def record_queries():
+    """Записывает запросы ко всем базам внутри блока with."""
+    recorder = QueryRecorder()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        yield recorder
+
+
+def get_budget(view_name, method='GET'):
+    """
+    Бюджет представления для метода запроса.
+
+    Ключ вида 'POST posts:post_create' задаёт бюджет для метода,
+    без метода — для всех остальных запросов к представлению.
+    """
+    budgets = settings.QUERY_BUDGETS
+    key = f'{method} {view_name}'
+    if key in budgets:
+        return budgets[key]
+    return budgets.get(view_name, settings.QUERY_BUDGET_DEFAULT)
+
+
+def find_violations(view_name, recorder, method='GET'):
+    """Список нарушений бюджета и повторов запросов для представления."""
+    violations = []
+    budget = get_budget(view_name, method)
+    if budget is not None and recorder.count > budget:
+        violations.append(
+            f'{method} {view_name}: {recorder.count} запросов '
+            f'при бюджете {budget}')
+    repeated = recorder.repeated_shapes(
+        settings.QUERY_BUDGET_REPEAT_THRESHOLD)
+    for shape, total in repeated.items():
+        violations.append(f'{view_name}: N+1, {total} раз: {shape}')
+    return violations
+
+
+def check_budget(view_name, recorder, method='GET'):
+    """
+    Проверяет запросы представления.
+
+    В строгом режиме (QUERY_BUDGET_STRICT, включается в тестах
+    раннером core.test_runner) нарушение вызывает QueryBudgetExceeded,
+    иначе пишется в лог.
+    """
+    violations = find_violations(view_name, recorder, method)
+    if not violations:
+        return
+    if settings.QUERY_BUDGET_STRICT:
+        raise QueryBudgetExceeded('\n'.join(violations))
+    for violation in violations:
+        logger.warning(violation)
@@ -0,0 +1,249 @@
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.checks import run_checks
+from django.core.management import call_command
+from django.db import connections
+from django.test import Client, TestCase, TransactionTestCase, \
+    override_settings
+from django.urls import reverse
+from posts import page_cache
+from posts.models import Post
+
+from . import db_router
+from .cache import keyspace, shared_timeout
+from .metrics import REGISTRY, Registry, merge_snapshots
+
+TEMP_METRICS_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+User = get_user_model()
+
+
+class MetricsViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_METRICS_DIR, ignore_errors=True)
+
+    def setUp(self):
+        self.user_client = Client()
+        self.user_client.force_login(self.user)
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+        cache.clear()
+
+    def test_metrics_forbidden_for_users(self):
+        """Метрики недоступны обычным пользователям и локальному адресу"""
+        response = self.user_client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 403)
+        response = Client(REMOTE_ADDR='127.0.0.1').get(reverse('metrics'))
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_available_by_token(self):
+        """Метрики доступны по токену"""
+        url = reverse('metrics')
+        response = Client(HTTP_AUTHORIZATION='Bearer secret').get(url)
+        self.assertEqual(response.status_code, 200)
+        response = Client(HTTP_AUTHORIZATION='Bearer wrong').get(url)
+        self.assertEqual(response.status_code, 403)
+
+    def test_metrics_collected_per_view(self):
+        """Метрики содержат время ответа, запросы, шаблоны и кэш"""
+        self.staff_client.get(reverse('posts:index'))
+        self.staff_client.get(reverse('posts:index'))
+        content = self.staff_client.get(reverse('metrics')).content.decode()
+        for line in (
+            'yatube_request_duration_seconds_count{view="posts:index"}',
+            'yatube_db_queries_bucket{view="posts:index",le="+Inf"}',
+            'yatube_template_render_seconds_count'
+            '{template="posts/index.html"}',
+            'yatube_cache_requests_total'
+            '{keyspace="pages:index",result="hit"}',
+        ):
+            with self.subTest(line=line):
+                self.assertIn(line, content)
+
+    @override_settings(METRICS_DIR=TEMP_METRICS_DIR)
+    def test_metrics_merged_across_processes(self):
+        """Снимки разных процессов складываются"""
+        first, second = Registry(), Registry()
+        first.inc('yatube_cache_requests_total', {'result': 'hit'})
+        second.inc('yatube_cache_requests_total', {'result': 'hit'}, 2)
+        second.observe('yatube_request_duration_seconds', {}, 0.2)
+        merged = merge_snapshots([first.snapshot(), second.snapshot()])
+        self.assertEqual(
+            merged.counters[('yatube_cache_requests_total',
+                             (('result', 'hit'),))], 3)
+        response = self.staff_client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS_DIR=TEMP_METRICS_DIR)
+    def test_dead_process_snapshots_are_archived(self):
+        """Снимки завершившихся процессов переносятся в архив"""
+        process = subprocess.Popen(['true'])
+        process.wait()
+        dead = Registry()
+        dead.inc('yatube_cache_requests_total', {'result': 'miss'}, 5)
+        dead.set('yatube_replica_lag_seconds', {'database': 'r'}, 1)
+        path = os.path.join(TEMP_METRICS_DIR, f'{process.pid}.json')
+        with open(path, 'w') as file:
+            json.dump(dead.snapshot(), file)
+        for _ in range(2):
+            content = self.staff_client.get(
+                reverse('metrics')).content.decode()
+            self.assertIn('yatube_cache_requests_total{result="miss"} 5',
+                          content)
+        self.assertNotIn('yatube_replica_lag_seconds{database="r"}',
+                         content)
+        self.assertFalse(os.path.exists(path))
+
+    @override_settings(METRICS_DIR=TEMP_METRICS_DIR)
+    def test_reused_pid_keeps_counters(self):
+        """Процесс с PID завершившегося не затирает его счётчики"""
+        previous = Registry()
+        previous.inc('yatube_cache_requests_total', {'result': 'stale'}, 3)
+        path = os.path.join(TEMP_METRICS_DIR, f'{os.getpid()}.json')
+        with open(path, 'w') as file:
+            json.dump(previous.snapshot(), file)
+        Registry().flush(force=True)
+        content = self.staff_client.get(reverse('metrics')).content.decode()
+        self.assertIn('yatube_cache_requests_total{result="stale"} 3',
+                      content)
+
+    def test_keyspace(self):
+        """Ключи кэша группируются для метрик"""
+        self.assertEqual(
+            keyspace('views.decorators.cache.cache_page.index_page.GET.x'),
+            'cache_page.index_page')
+        self.assertEqual(keyspace('posts:count:group:1'), 'posts:count')
+
+    @override_settings(LOCAL_CACHE_TIMEOUT=60)
+    def test_local_cache_keeps_entries_briefly(self):
+        """В кэше памяти процесса сбрасываемые записи живут недолго"""
+        self.assertEqual(shared_timeout(None), 60)
+        self.assertEqual(shared_timeout(3600), 60)
+        shared = FileBasedCache(TEMP_METRICS_DIR, {})
+        self.assertIsNone(shared_timeout(None, shared))
+        self.assertEqual(shared_timeout(3600, shared), 3600)
+        warnings = run_checks(include_deployment_checks=True)
+        self.assertIn('core.W001', [warning.id for warning in warnings])
+
+
+class ReplicaRoutingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+
+    def setUp(self):
+        self.client = Client()
+        self.user_client = Client()
+        self.user_client.force_login(self.user)
+        db_router._freshness.clear()
+        cache.clear()
+
+    def replica_reads(self):
+        return REGISTRY.counters[('yatube_replica_reads_total',
+                                  (('database', 'default'),))]
+
+    @override_settings(REPLICA_DATABASES=['replica'])
+    def test_router_reads_replica_inside_request(self):
+        """Реплика читается только в разрешённом запросе и до записи"""
+        router = db_router.ReplicaRouter()
+        db_router._freshness['replica'] = (time.monotonic(), time.time())
+        self.assertEqual(router.db_for_read(User), 'default')
+        state, token = db_router.activate()
+        try:
+            self.assertEqual(router.db_for_read(User), 'default')
+            state.use_replicas = True
+            self.assertEqual(router.db_for_read(User), 'replica')
+            self.assertEqual(router.db_for_write(User), 'default')
+            self.assertEqual(router.db_for_read(User), 'default')
+        finally:
+            db_router.deactivate(token)
+        self.assertFalse(router.allow_migrate('replica', 'posts'))
+
+    @override_settings(REPLICA_DATABASES=['replica'])
+    def test_lagging_replica_is_skipped(self):
+        """Отстающая реплика не используется"""
+        router = db_router.ReplicaRouter()
+        db_router._freshness['replica'] = (time.monotonic(),
+                                           time.time() - 60)
+        state, token = db_router.activate()
+        try:
+            state.use_replicas = True
+            self.assertEqual(router.db_for_read(User), 'default')
+        finally:
+            db_router.deactivate(token)
+
+    @override_settings(REPLICA_DATABASES=['default'])
+    def test_write_pins_user_to_primary(self):
+        """После записи пользователь какое-то время читает основную базу"""
+        db_router.beat()
+        before = self.replica_reads()
+        self.user_client.get(reverse('posts:index'))
+        self.assertEqual(self.replica_reads(), before + 1)
+        response = self.user_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            {'text': 'Комментарий'})
+        self.assertIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+        self.user_client.get(reverse('posts:index'))
+        self.user_client.get(reverse('posts:post_create'))
+        self.assertEqual(self.replica_reads(), before + 1)
+        self.user.is_staff = True
+        self.user.save()
+        content = self.user_client.get(reverse('metrics')).content.decode()
+        self.assertIn('yatube_replica_lag_seconds{database="default"}',
+                      content)
+
+    @override_settings(REPLICA_DATABASES=['default'])
+    def test_stale_replica_page_is_not_cached(self):
+        """Страница с реплики старше версий областей не кэшируется"""
+        db_router.beat()
+        page_cache.bump(page_cache.ALL_POSTS_SCOPE)
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotIn('ETag', response)
+        db_router._freshness.clear()
+        db_router.beat()
+        response = self.client.get(reverse('posts:index'))
+        self.assertIn('ETag', response)
+
+
+class SyncReplicasTests(TransactionTestCase):
+    # Копия снимается вне транзакции, как при обычном запуске команды
+    def test_sync_replicas_copies_database(self):
+        """sync_replicas копирует основную базу в файл реплики"""
+        Post.objects.create(author=User.objects.create_user('author'),
+                            text='Пост')
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'replica.sqlite3')
+        replica = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': path}
+        with mock.patch.dict(connections.databases, {'replica': replica}), \
+                override_settings(REPLICA_DATABASES=['replica']):
+            call_command('sync_replicas', stdout=StringIO())
+        target = sqlite3.connect(path)
+        try:
+            (count,) = target.execute(
+                'SELECT COUNT(*) FROM posts_post').fetchone()
+        finally:
+            target.close()
+        self.assertEqual(count, 1)
@@ -1,4 +1,15 @@
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+from django.views.static import serve
+
+from posts.storage import is_content_addressed
+
+from .metrics import render_metrics
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
 
 
 def page_not_found(request, exception):
@@ -17,3 +28,29 @@ def permission_denied(request, exception):
 
 def server_error(request):
     return render(request, 'core/500.html', status=500)
+
+
+def has_metrics_token(request):
+    token = settings.METRICS_TOKEN
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    return bool(token) and constant_time_compare(header, f'Bearer {token}')
+
+
+def metrics(request):
+    """Метрики Prometheus: для персонала или по токену METRICS_TOKEN."""
+    if not (request.user.is_staff or has_metrics_token(request)):
+        raise PermissionDenied
+    return HttpResponse(render_metrics(),
+                        content_type='text/plain; version=0.0.4')
+
+
+def serve_media(request, path, document_root=None):
+    """
+    Медиафайлы для режима отладки. Файлы с хешем содержимого в имени
+    не меняются, поэтому кэшируются без срока; в боевом окружении такой
+    же заголовок для /media/posts/ ставит веб-сервер.
+    """
+    response = serve(request, path, document_root=document_root)
+    if is_content_addressed(path):
+        response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
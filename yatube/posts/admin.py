@@ -1,18 +1,50 @@
 from django.contrib import admin
 
+from . import export, search
 from .models import Group, Post
+from .paginators import ChangeListPaginator
 
 
 class PostAdmin(admin.ModelAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author', 'group')
-    list_editable = ('group',)
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
+    autocomplete_fields = ('author', 'group')
+    paginator = ChangeListPaginator
+    show_full_result_count = False
     empty_value_display = '-пусто-'
+    actions = ('export_csv', 'export_ndjson')
+
+    def get_paginator(self, request, queryset, per_page, orphans=0,
+                      allow_empty_first_page=True):
+        try:
+            number = int(request.GET.get('p', 1))
+        except ValueError:
+            number = 1
+        return self.paginator(queryset, per_page, orphans,
+                              allow_empty_first_page, number=number)
+
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск по тексту через индекс FTS5 вместо LIKE по всем постам."""
+        if not search_term or not search.is_available():
+            return super().get_search_results(request, queryset,
+                                              search_term)
+        return queryset.filter(id__in=search.matching_ids(search_term)), False
+
+    @admin.action(description='Выгрузить выбранные посты в CSV')
+    def export_csv(self, request, queryset):
+        return export.response(queryset.order_by('pk'), 'posts', 'csv')
+
+    @admin.action(description='Выгрузить выбранные посты в NDJSON')
+    def export_ndjson(self, request, queryset):
+        return export.response(queryset.order_by('pk'), 'posts', 'ndjson')
 
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('title', 'slug', 'description')
+    search_fields = ('title', 'slug')
 
 
 admin.site.register(Post, PostAdmin)
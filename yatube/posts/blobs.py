@@ -0,0 +1,97 @@
+"""
+ Счётчики ссылок постов на файлы картинок.
+
+ Одинаковые картинки хранятся одним файлом (см. posts/storage.py),
+ поэтому удалить файл можно, только когда на него не ссылается ни один
+ пост. Счётчики меняются сигналами из posts/signals.py, файлы без ссылок
+ удаляет команда prune_images — не сразу, чтобы не удалить файл, который
+ в это время загружают повторно. Повторная загрузка трогает файл, и
+ тронутый после освобождения файл prune_images возвращает на место.
+"""
+
+import os
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import thumbnails
+from .models import ImageBlob, Post
+
+
+def acquire(name, count=1):
+    """Добавляет count ссылок на файл name."""
+    updated = ImageBlob.objects.filter(name=name).update(
+        references=F('references') + count, released=None)
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            ImageBlob.objects.create(name=name, references=count)
+    except IntegrityError:
+        acquire(name, count)
+
+
+def release(name):
+    """Убирает ссылку на файл name и запоминает, когда ссылок не стало."""
+    ImageBlob.objects.filter(name=name, references__gt=0).update(
+        references=F('references') - 1)
+    ImageBlob.objects.filter(name=name, references=0).update(
+        released=timezone.now())
+
+
+def prune(grace):
+    """
+    Удаляет файлы без ссылок дольше grace вместе с их вариантами.
+
+    Возвращает количество удалённых файлов.
+    """
+    names = ImageBlob.objects.filter(
+        references=0, released__lt=timezone.now() - grace,
+    ).values_list('name', flat=True)
+    return sum(_prune_file(name) for name in names.iterator())
+
+
+def _prune_file(name):
+    """
+    Удаляет файл name, если на него так и не сослались снова.
+
+    Загрузка того же содержимого не пишет файл заново, а только трогает
+    его (см. ContentAddressedStorage._save), и ссылку берёт позже, уже
+    при сохранении поста. Поэтому файл сначала убирается в сторону, пока
+    строка заблокирована, а после удаления строки возвращается, если его
+    тронули после освобождения или на него снова сослались.
+    """
+    storage = Post._meta.get_field('image').storage
+    path = storage.path(name)
+    aside = f'{path}.pruning'
+    with transaction.atomic():
+        blob = (ImageBlob.objects.select_for_update()
+                .filter(name=name, references=0).first())
+        if blob is None:
+            return False
+        try:
+            os.replace(path, aside)
+        except FileNotFoundError:
+            aside = None
+        blob.delete()
+    if aside is not None and (
+            os.stat(aside).st_mtime >= blob.released.timestamp()
+            or ImageBlob.objects.filter(name=name).exists()):
+        _restore(name, path, aside)
+        return False
+    if aside is not None:
+        os.remove(aside)
+    thumbnails.backend.delete(name)
+    return True
+
+
+def _restore(name, path, aside):
+    """Возвращает файл на место и заводит освобождённую ссылку на него."""
+    if os.path.exists(path):
+        os.remove(aside)
+    else:
+        os.replace(aside, path)
+    # Если пост так и не сохранится, файл снова достанется prune
+    acquire(name)
+    release(name)
@@ -0,0 +1,19 @@
+"""
+ Помощники массовой загрузки через bulk_create.
+
+ Используются командами seed_bench и import_data.
+"""
+
+from contextlib import contextmanager
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Отключает auto_now_add, чтобы bulk_create сохранил заданные даты."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
@@ -0,0 +1,151 @@
+"""
+ Денормализованные счётчики: посты автора, комментарии поста,
+ подписчики и подписки пользователя.
+
+ Счётчики меняются обновлениями F() в сигналах posts/signals.py,
+ поэтому параллельные запросы не теряют изменений. Расхождения
+ исправляет команда reconcile_counters.
+"""
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from .models import Comment, Follow, Post, User, UserStats
+
+STATS_FIELDS = ('posts_count', 'followers_count', 'following_count')
+
+
+def _actual_user_stats(user_ids):
+    """Считает счётчики пользователей по данным таблиц."""
+    stats = {user_id: dict.fromkeys(STATS_FIELDS, 0)
+             for user_id in user_ids}
+    sources = (
+        (Post.objects, 'author_id', 'posts_count'),
+        (Follow.objects, 'author_id', 'followers_count'),
+        (Follow.objects, 'user_id', 'following_count'),
+    )
+    for manager, field, counter in sources:
+        totals = (manager.filter(**{f'{field}__in': user_ids})
+                  .order_by().values_list(field)
+                  .annotate(total=Count('pk')))
+        for user_id, total in totals:
+            stats[user_id][counter] = total
+    return stats
+
+
+def change_user_stats(user_id, **deltas):
+    """
+    Изменяет счётчики пользователя на deltas.
+
+    Отсутствующая строка создаётся только при увеличении: её значения
+    сразу считаются по таблицам, поэтому уже учитывают изменение. Если
+    строку параллельно создал другой запрос, она могла не увидеть ещё
+    не зафиксированное изменение этого, поэтому обновление повторяется,
+    как в blobs.acquire.
+    """
+    not_negative = {f'{field}__gte': -delta
+                    for field, delta in deltas.items() if delta < 0}
+    updated = UserStats.objects.filter(
+        user_id=user_id, **not_negative).update(
+        **{field: F(field) + delta for field, delta in deltas.items()})
+    if updated or min(deltas.values()) < 0:
+        return
+    try:
+        with transaction.atomic():
+            UserStats.objects.create(user_id=user_id,
+                                     **_actual_user_stats([user_id])[user_id])
+    except IntegrityError:
+        change_user_stats(user_id, **deltas)
+
+
+def change_comments_count(post_id, delta):
+    Post.objects.filter(pk=post_id, comments_count__gte=-delta).update(
+        comments_count=F('comments_count') + delta)
+
+
+def get_user_stats(user):
+    """Счётчики пользователя; для пользователя без строки — нули."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return UserStats(user=user)
+
+
+def reconcile_user_stats(batch_size, user_ids=None):
+    """
+    Сверяет счётчики пользователей пачками по batch_size: всех или
+    только user_ids.
+
+    Возвращает количество исправленных строк.
+    """
+    repaired = 0
+    if user_ids is None:
+        user_ids = (User.objects.order_by('pk').values_list('pk', flat=True)
+                    .iterator(chunk_size=batch_size))
+    else:
+        user_ids = sorted(user_ids)
+    batch = []
+    for user_id in user_ids:
+        batch.append(user_id)
+        if len(batch) == batch_size:
+            repaired += _reconcile_user_batch(batch)
+            batch = []
+    if batch:
+        repaired += _reconcile_user_batch(batch)
+    return repaired
+
+
+def _reconcile_user_batch(user_ids):
+    actual = _actual_user_stats(user_ids)
+    stored = UserStats.objects.in_bulk(user_ids)
+    to_create, to_update = [], []
+    for user_id, values in actual.items():
+        stats = stored.get(user_id)
+        if stats is None:
+            to_create.append(UserStats(user_id=user_id, **values))
+        elif any(getattr(stats, field) != value
+                 for field, value in values.items()):
+            for field, value in values.items():
+                setattr(stats, field, value)
+            to_update.append(stats)
+    with transaction.atomic():
+        UserStats.objects.bulk_create(to_create, ignore_conflicts=True)
+        UserStats.objects.bulk_update(to_update, STATS_FIELDS)
+    return len(to_create) + len(to_update)
+
+
+def reconcile_comments_count(batch_size, post_ids=None):
+    """
+    Сверяет счётчики комментариев постов пачками по batch_size: всех
+    или только post_ids.
+
+    Возвращает количество исправленных постов.
+    """
+    if post_ids is not None:
+        post_ids = sorted(post_ids)
+        return sum(_reconcile_comments_batch(
+            Post.objects.filter(pk__in=post_ids[start:start + batch_size])
+            .values_list('pk', 'comments_count'))
+            for start in range(0, len(post_ids), batch_size))
+    repaired = 0
+    last_id = 0
+    while True:
+        posts = list(Post.objects.filter(pk__gt=last_id).order_by('pk')
+                     .values_list('pk', 'comments_count')[:batch_size])
+        if not posts:
+            return repaired
+        last_id = posts[-1][0]
+        repaired += _reconcile_comments_batch(posts)
+
+
+def _reconcile_comments_batch(posts):
+    """Исправляет comments_count постов из пар (pk, счётчик)."""
+    posts = list(posts)
+    actual = dict(Comment.objects
+                  .filter(post_id__in=[pk for pk, _ in posts])
+                  .order_by().values_list('post_id')
+                  .annotate(total=Count('pk')))
+    drifted = [Post(pk=pk, comments_count=actual.get(pk, 0))
+               for pk, stored in posts if actual.get(pk, 0) != stored]
+    Post.objects.bulk_update(drifted, ['comments_count'])
+    return len(drifted)
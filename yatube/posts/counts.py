@@ -0,0 +1,56 @@
+"""
+ Кэш количества постов в лентах.
+
+ Ключи строятся для каждой ленты отдельно: все посты, посты группы,
+ посты автора и лента подписок пользователя. Сбрасываются сигналами
+ из posts/signals.py. Количество ленты подписок нужно только
+ материализованной ленте (см. posts/feeds.py), поэтому его ключ
+ сбрасывается лишь у тех, в чью ленту пост записан или из неё удалён:
+ посты авторов, выбираемых при чтении, подписчиков не перебирают.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.cache import shared_timeout
+
+ALL_POSTS_KEY = 'posts:count:all'
+
+
+def group_posts_key(group_id):
+    return f'posts:count:group:{group_id}'
+
+
+def author_posts_key(author_id):
+    return f'posts:count:author:{author_id}'
+
+
+def follow_posts_key(user_id):
+    return f'posts:count:follow:{user_id}'
+
+
+def cached_count(key, queryset):
+    """Возвращает количество записей queryset, кэшируя его по ключу."""
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count,
+                  shared_timeout(settings.POST_COUNT_CACHE_TIMEOUT))
+    return count
+
+
+def invalidate_post_counts(author_id, group_ids=(), follower_ids=()):
+    """Сбрасывает счётчики лент, в которые попадает пост."""
+    keys = [ALL_POSTS_KEY, author_posts_key(author_id)]
+    keys += [group_posts_key(group_id)
+             for group_id in group_ids if group_id is not None]
+    keys += [follow_posts_key(user_id) for user_id in follower_ids]
+    cache.delete_many(keys)
+
+
+def invalidate_follow_count(user_id):
+    cache.delete(follow_posts_key(user_id))
+
+
+def invalidate_follow_counts(user_ids):
+    cache.delete_many([follow_posts_key(user_id) for user_id in user_ids])
@@ -0,0 +1,147 @@
+"""
+ Лента подписок: гибрид push и pull.
+
+ Пост обычного автора сразу раскладывается в ленты подписчиков
+ (FeedItem), поэтому страница подписок читает готовые записи одного
+ пользователя по индексу (user, pub_date). Посты авторов, у которых
+ подписчиков больше FEED_PULL_FOLLOWER_THRESHOLD, в ленты не пишутся:
+ они выбираются при чтении и сливаются с материализованной лентой
+ (см. MergedCursorPaginator). Когда после отписок автор снова
+ становится обычным, его последние посты раскладываются в ленты всех
+ подписчиков (backfill_followers).
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .models import FeedItem, Follow, Post, UserStats
+
+CURSOR_KEY = ('feed_date', 'feed_post')
+
+
+def pull_author_ids(author_ids):
+    """Возвращает авторов из author_ids, чьи посты выбираются при чтении."""
+    return set(UserStats.objects.filter(
+        user_id__in=author_ids,
+        followers_count__gt=settings.FEED_PULL_FOLLOWER_THRESHOLD,
+    ).values_list('user_id', flat=True))
+
+
+def is_pull_author(author_id):
+    return author_id in pull_author_ids([author_id])
+
+
+def _feed_items(post, user_ids):
+    return [FeedItem(user_id=user_id,
+                     post_id=post.id,
+                     author_id=post.author_id,
+                     pub_date=post.pub_date)
+            for user_id in user_ids]
+
+
+def is_back_to_push(author_id):
+    """Автор только что опустился до порога подписчиков."""
+    return UserStats.objects.filter(
+        user_id=author_id,
+        followers_count=settings.FEED_PULL_FOLLOWER_THRESHOLD,
+    ).exists()
+
+
+def push_post(post):
+    """
+    Добавляет новый пост в ленты подписчиков обычного автора.
+
+    Возвращает подписчиков, в чьи ленты записан пост.
+    """
+    if is_pull_author(post.author_id):
+        return []
+    follower_ids = list(Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True))
+    FeedItem.objects.bulk_create(_feed_items(post, follower_ids),
+                                 batch_size=settings.FEED_BATCH_SIZE,
+                                 ignore_conflicts=True)
+    return follower_ids
+
+
+def feed_user_ids(post_id):
+    """Пользователи, в чьих лентах есть пост."""
+    return list(FeedItem.objects.filter(post_id=post_id)
+                .values_list('user_id', flat=True))
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту подписчика последние посты обычного автора."""
+    if is_pull_author(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date')[:settings.FEED_BACKFILL_LIMIT]
+    FeedItem.objects.bulk_create(
+        [item for post in posts.only('id', 'author_id', 'pub_date')
+         for item in _feed_items(post, [user_id])],
+        batch_size=settings.FEED_BATCH_SIZE,
+        ignore_conflicts=True)
+
+
+def backfill_followers(author_id):
+    """
+    Добавляет последние посты автора в ленты всех его подписчиков.
+
+    Нужна, когда автор перестаёт выбираться при чтении: пока он был
+    таким, его посты в ленты не писались. Возвращает подписчиков.
+    """
+    posts = list(Post.objects.filter(author_id=author_id)
+                 .order_by('-pub_date')
+                 .only('id', 'author_id', 'pub_date')
+                 [:settings.FEED_BACKFILL_LIMIT])
+    follower_ids = list(Follow.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True))
+    for post in posts:
+        FeedItem.objects.bulk_create(_feed_items(post, follower_ids),
+                                     batch_size=settings.FEED_BATCH_SIZE,
+                                     ignore_conflicts=True)
+    return follower_ids
+
+
+def trim(user_id, author_id):
+    """Убирает из ленты подписчика посты автора после отписки."""
+    FeedItem.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild(batch_size=None):
+    """
+    Пересобирает все ленты подписок с нуля.
+
+    Возвращает количество созданных записей.
+    """
+    batch_size = batch_size or settings.FEED_BATCH_SIZE
+    with transaction.atomic():
+        FeedItem.objects.all().delete()
+        follows = Follow.objects.values_list('user_id', 'author_id')
+        for user_id, author_id in follows.iterator(chunk_size=batch_size):
+            backfill(user_id, author_id)
+    return FeedItem.objects.count()
+
+
+def user_feed(user):
+    """
+    Источники ленты подписок пользователя, от новых постов к старым.
+
+    Первый источник — материализованная лента, дальше — посты авторов,
+    которые выбираются при чтении. У всех источников общий ключ
+    CURSOR_KEY, который обслуживается индексом ленты.
+    """
+    sources = [Post.objects.filter(feed_items__user=user)
+               .annotate(feed_date=F('feed_items__pub_date'),
+                         feed_post=F('feed_items__post'))
+               .select_related('author', 'group')
+               .order_by('-feed_date', '-feed_post')]
+    followed = Follow.objects.filter(user=user).values_list('author_id',
+                                                            flat=True)
+    pulled = pull_author_ids(followed)
+    if pulled:
+        sources.append(Post.objects.filter(author_id__in=pulled)
+                       .annotate(feed_date=F('pub_date'), feed_post=F('id'))
+                       .select_related('author', 'group')
+                       .order_by('-feed_date', '-feed_post'))
+    return sources
@@ -0,0 +1,31 @@
+"""
+ Размеры картинок постов.
+
+ Ширина, высота и размер файла сохраняются в полях поста при загрузке
+ картинки (сигнал в posts/signals.py), а для старых постов — командой
+ fill_image_metadata. Шаблоны берут их из полей и не открывают файлы.
+ width_field/height_field у ImageField не подходят: Django открывает
+ файл при создании каждого объекта, у которого размеры не заполнены.
+"""
+
+from django.core.files.images import get_image_dimensions
+
+EMPTY = {'image_width': None, 'image_height': None, 'image_size': None}
+
+
+def metadata(file_):
+    """
+    Поля размеров картинки file_: {'image_width': ..., ...}.
+
+    Читается только заголовок картинки. Если файл не прочитать, поля
+    пустые.
+    """
+    if not file_:
+        return EMPTY
+    try:
+        width, height = get_image_dimensions(file_)
+        size = file_.size
+    except OSError:
+        return EMPTY
+    return {'image_width': width, 'image_height': height,
+            'image_size': size}
@@ -0,0 +1,211 @@
+import json
+import math
+import platform
+import sys
+import time
+from importlib import import_module
+from io import BytesIO
+from wsgiref.util import setup_testing_defaults
+
+import django
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, \
+    SESSION_KEY
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from core.query_budget import record_queries
+from posts.models import Follow, Group, Post, User, UserStats
+from posts.urls import app_name, urlpatterns
+
+
+def percentile(values, percent):
+    """Процентиль методом ближайшего ранга по отсортированному списку."""
+    if not values:
+        return None
+    rank = max(math.ceil(percent / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+class Command(BaseCommand):
+    help = ('Прогоняет все адреса posts/urls.py через WSGI-обработчик и '
+            'измеряет пропускную способность, задержки и SQL-запросы')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Запросов на каждый адрес')
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--username', default=None,
+                            help='Пользователь для адресов с авторизацией; '
+                                 'по умолчанию самый активный подписчик')
+        parser.add_argument('--route', action='append', default=None,
+                            help='Имя адреса (можно несколько раз)')
+        parser.add_argument('--query', default='',
+                            help='Строка запроса, например after=... '
+                                 'или page=100')
+        parser.add_argument('--per-page', type=int, action='append',
+                            default=None,
+                            help='Постов на странице ленты (можно '
+                                 'несколько раз): число запросов не должно '
+                                 'от него зависеть')
+        parser.add_argument('--cold-cache', action='store_true',
+                            help='Очищать кэш перед каждым запросом')
+        parser.add_argument('--format', choices=('table', 'json'),
+                            default='table')
+        parser.add_argument('--output', default=None,
+                            help='Файл для результата вместо stdout')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests должно быть больше нуля')
+        self.handler = WSGIHandler()
+        self.cookie = self.login_cookie(options['username'])
+        kwargs = self.route_kwargs()
+        results = []
+        for per_page in options['per_page'] or [settings.POST_PER_PAGE]:
+            if per_page < 1:
+                raise CommandError('--per-page должно быть больше нуля')
+            # Страницы с другим размером не должны браться из кэша
+            cache.clear()
+            with override_settings(POST_PER_PAGE=per_page):
+                for pattern in urlpatterns:
+                    if (options['route']
+                            and pattern.name not in options['route']):
+                        continue
+                    path = reverse(f'{app_name}:{pattern.name}',
+                                   kwargs={name: kwargs[name] for name
+                                           in pattern.pattern.converters})
+                    following = self.following()
+                    result = self.bench(pattern.name, path, options)
+                    self.restore_following(following)
+                    result['per_page'] = per_page
+                    results.append(result)
+        report = {
+            'timestamp': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'pagination': settings.POST_PAGINATION,
+            'requests': options['requests'],
+            'query': options['query'],
+            'cold_cache': options['cold_cache'],
+            'routes': results,
+        }
+        output = (json.dumps(report, ensure_ascii=False, indent=2)
+                  if options['format'] == 'json' else self.table(results))
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+    def login_cookie(self, username):
+        if username:
+            user = User.objects.filter(username=username).first()
+        else:
+            follower = (UserStats.objects.order_by('-following_count')
+                        .values_list('user', flat=True).first())
+            user = User.objects.filter(pk=follower).first()
+        if user is None:
+            raise CommandError('Нет пользователя для авторизованных адресов')
+        engine = import_module(settings.SESSION_ENGINE)
+        session = engine.SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+        self.user = user
+        return f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+
+    def route_kwargs(self):
+        group = Group.objects.order_by('-id').first()
+        post = (Post.objects.filter(author=self.user).first()
+                or Post.objects.first())
+        author = (User.objects.exclude(pk=self.user.pk)
+                  .order_by('-stats__posts_count').first())
+        if group is None or post is None or author is None:
+            raise CommandError('Сначала заполните базу: seed_bench')
+        return {'slug': group.slug,
+                'username': author.username,
+                'post_id': post.pk}
+
+    def following(self):
+        return set(Follow.objects.filter(user=self.user)
+                   .values_list('author_id', flat=True))
+
+    def restore_following(self, following):
+        """
+        Возвращает подписки, изменённые адресами подписки и отписки
+        (они пишут на GET). Через модели, чтобы сигналы вернули и
+        счётчики, и ленты: иначе замеры зависели бы от порядка адресов
+        и прошлых запусков.
+        """
+        current = self.following()
+        Follow.objects.filter(user=self.user,
+                              author_id__in=current - following).delete()
+        for author_id in following - current:
+            Follow.objects.create(user=self.user, author_id=author_id)
+
+    def request(self, path, query):
+        environ = {
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'REQUEST_METHOD': 'GET',
+            'HTTP_COOKIE': self.cookie,
+            'wsgi.input': BytesIO(),
+            'wsgi.errors': sys.stderr,
+        }
+        setup_testing_defaults(environ)
+        statuses = []
+        response = self.handler(
+            environ, lambda status, headers, *args: statuses.append(status))
+        for _ in response:
+            pass
+        response.close()
+        return statuses[0]
+
+    def bench(self, name, path, options):
+        for _ in range(options['warmup']):
+            self.request(path, options['query'])
+        latencies, queries, statuses = [], [], {}
+        started = time.perf_counter()
+        for _ in range(options['requests']):
+            if options['cold_cache']:
+                cache.clear()
+            with record_queries() as recorder:
+                start = time.perf_counter()
+                status = self.request(path, options['query'])
+                latencies.append(time.perf_counter() - start)
+            queries.append(recorder.count)
+            statuses[status] = statuses.get(status, 0) + 1
+        elapsed = time.perf_counter() - started
+        latencies.sort()
+        return {
+            'route': f'{app_name}:{name}',
+            'path': path,
+            'statuses': statuses,
+            'throughput_rps': round(len(latencies) / elapsed, 2),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+            'queries_per_request': round(sum(queries) / len(queries), 2),
+            'max_queries': max(queries),
+        }
+
+    def table(self, results):
+        header = ('route', 'per page', 'rps', 'p50 ms', 'p95 ms', 'p99 ms',
+                  'queries')
+        rows = [header] + [
+            (row['route'], str(row['per_page']), str(row['throughput_rps']),
+             str(row['p50_ms']), str(row['p95_ms']), str(row['p99_ms']),
+             str(row['queries_per_request']))
+            for row in results]
+        widths = [max(len(row[index]) for row in rows)
+                  for index in range(len(header))]
+        return '\n'.join(
+            '  '.join(cell.ljust(width) for cell, width in zip(row, widths))
+            for row in rows)
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+
+
+class Command(BaseCommand):
+    help = 'Выгружает посты, комментарии или подписки в NDJSON или CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(export.EXPORTS))
+        parser.add_argument('--format', choices=sorted(export.FORMATS),
+                            default='ndjson')
+        parser.add_argument('--author', help='Имя пользователя автора')
+        parser.add_argument('--group', help='Адрес (slug) группы')
+        parser.add_argument('--since', help='Первый день, ГГГГ-ММ-ДД')
+        parser.add_argument('--until', help='Последний день, ГГГГ-ММ-ДД')
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help='Строк за одно чтение из базы; '
+                                 'по умолчанию EXPORT_CHUNK_SIZE')
+        parser.add_argument('--output', default=None,
+                            help='Файл для выгрузки вместо stdout')
+
+    def handle(self, *args, **options):
+        try:
+            records = export.queryset(
+                options['kind'], author=options['author'],
+                group=options['group'], since=options['since'],
+                until=options['until'])
+            lines = export.stream(records, options['kind'],
+                                  options['format'], options['chunk_size'])
+        except export.ExportError as error:
+            raise CommandError(error)
+        if options['output'] is None:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        with open(options['output'], 'w', newline='') as file:
+            file.writelines(lines)
+        self.stdout.write(self.style.SUCCESS(
+            f'Выгрузка сохранена в {options["output"]}'))
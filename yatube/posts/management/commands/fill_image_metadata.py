@@ -0,0 +1,52 @@
+from collections import defaultdict
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.management.base import BaseCommand
+
+from posts import images
+from posts.models import Post
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = 'Заполняет размеры картинок постов, загруженных до их появления'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        storage = Post._meta.get_field('image').storage
+        # По диапазонам первичного ключа: у image нет индекса, и выборка
+        # по имени файла сканировала бы таблицу на каждый пакет и файл
+        pending = (Post.objects.filter(image_width__isnull=True)
+                   .exclude(image='').order_by('pk')
+                   .values_list('pk', 'image'))
+        filled = missing = 0
+        last_pk = 0
+        while True:
+            batch = list(pending.filter(pk__gt=last_pk)
+                         [:options['batch_size']])
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+            # Общая картинка пакета читается один раз
+            post_ids = defaultdict(list)
+            for pk, name in batch:
+                post_ids[name].append(pk)
+            for name, pks in post_ids.items():
+                fields = self.read_metadata(storage, name)
+                if fields is None or fields['image_width'] is None:
+                    missing += 1
+                    continue
+                filled += Post.objects.filter(pk__in=pks).update(**fields)
+        self.stdout.write(self.style.SUCCESS(
+            f'Заполнены размеры картинок у {filled} постов, '
+            f'файлов не найдено или не прочитано: {missing}'))
+
+    def read_metadata(self, storage, name):
+        try:
+            with storage.open(name) as file_:
+                return images.metadata(file_)
+        except (OSError, SuspiciousFileOperation):
+            return None
@@ -0,0 +1,51 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import page_cache, thumbnails
+from posts.models import Post
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = 'Создаёт недостающие варианты картинок постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Процессов для создания вариантов; '
+                                 'по умолчанию POST_THUMBNAIL_WORKERS')
+
+    def handle(self, *args, **options):
+        posts = defaultdict(list)
+        for post_id, author_id, group_id, name in (
+                Post.objects.exclude(image='').order_by()
+                .values_list('id', 'author_id', 'group_id', 'image')
+                .iterator()):
+            posts[name].append((post_id, author_id, group_id))
+        names = list(posts)
+        pending = []
+        for start in range(0, len(names), BATCH_SIZE):
+            ready = thumbnails.ready_thumbnails(
+                names[start:start + BATCH_SIZE])
+            pending += [name for name, variants in ready.items()
+                        if not thumbnails.is_complete(variants)]
+        workers = options['workers']
+        if workers is None:
+            workers = settings.POST_THUMBNAIL_WORKERS
+        pool = thumbnails.make_pool(workers) if workers else None
+        created = failed = 0
+        try:
+            for name, ok in thumbnails.generate_many(pending, pool):
+                if not ok:
+                    failed += 1
+                    continue
+                created += 1
+                for post in posts[name]:
+                    page_cache.bump(*thumbnails.post_scopes(*post))
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        self.stdout.write(f'Созданы варианты для {created} картинок, '
+                          f'ошибок: {failed}')
@@ -0,0 +1,304 @@
+import csv
+import json
+import os
+import sys
+import time
+from collections import Counter
+from contextlib import nullcontext
+from itertools import islice
+
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+from django.utils._os import safe_join
+from django.utils.dateparse import parse_datetime
+
+from posts import blobs, counters, counts, export, feeds, images, page_cache
+from posts.bulk import explicit_dates
+from posts.models import Comment, Group, Post, User
+
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = ('Загружает посты или комментарии из NDJSON или CSV '
+            '(в формате export_data) пачками через bulk_create')
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=('posts', 'comments'))
+        parser.add_argument('path', help='Файл для загрузки; - для stdin')
+        parser.add_argument('--format', choices=sorted(export.FORMATS),
+                            default=None,
+                            help='По умолчанию по расширению файла')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help='Строк в одной транзакции')
+        parser.add_argument('--images-dir', default=None,
+                            help='Каталог с картинками из поля image; '
+                                 'без него image — имя файла в MEDIA_ROOT')
+        parser.add_argument('--checkpoint', default=None,
+                            help='Файл с номером последней загруженной '
+                                 'строки для продолжения после сбоя')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or os.path.splitext(path)[1][1:]
+        if file_format not in export.FORMATS:
+            raise CommandError('Укажите формат: --format ndjson или csv')
+        self.kind = options['kind']
+        self.images_dir = options['images_dir']
+        self.storage = Post._meta.get_field('image').storage
+        self.checkpoint = options['checkpoint']
+        self.lookups = {User: {}, Group: {}, Post: {}}
+        self.touched = {User: set(), Group: set(), Post: set()}
+        done = self.read_checkpoint()
+        imported = failed = 0
+        started = time.perf_counter()
+        source = (nullcontext(sys.stdin) if path == '-'
+                  else open(path, newline=''))
+        with source as file:
+            rows = enumerate(self.read(file, file_format), 1)
+            self.skip(rows, done, options['batch_size'])
+            while True:
+                batch = list(islice(rows, options['batch_size']))
+                if not batch:
+                    break
+                try:
+                    created, errors = self.load(batch)
+                except IntegrityError as error:
+                    raise CommandError(
+                        f'Строки {batch[0][0]}–{batch[-1][0]} не '
+                        f'загружены: {error}')
+                imported += created
+                failed += errors
+                self.write_checkpoint(batch[-1][0])
+                if options['verbosity'] > 1:
+                    self.stdout.write(self.progress(
+                        batch[-1][0] - done, imported, started))
+        if imported or done:
+            self.rebuild_derived(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено: {imported}, ошибок: {failed}; '
+            + self.progress(imported + failed, imported, started)))
+        if imported and self.kind == 'posts':
+            self.stdout.write('Варианты картинок создаст '
+                              'generate_thumbnails, размеры старых '
+                              'картинок — fill_image_metadata')
+
+    def progress(self, rows, imported, started):
+        rate = rows / max(time.perf_counter() - started, 1e-9)
+        return f'строк: {rows}, {rate:.0f} строк/с'
+
+    def read(self, file, file_format):
+        if file_format == 'csv':
+            yield from csv.DictReader(file)
+            return
+        for line in file:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None
+
+    def read_checkpoint(self):
+        if self.checkpoint is None or not os.path.exists(self.checkpoint):
+            return 0
+        with open(self.checkpoint) as file:
+            return int(file.read() or 0)
+
+    def write_checkpoint(self, number):
+        if self.checkpoint is None:
+            return
+        temp_path = f'{self.checkpoint}.tmp'
+        with open(temp_path, 'w') as file:
+            file.write(str(number))
+        os.replace(temp_path, self.checkpoint)
+
+    def resolve(self, model, field, values):
+        """Дополняет карту значение → id недостающими значениями."""
+        lookup = self.lookups[model]
+        missing = {value for value in values
+                   if value and value not in lookup}
+        if missing:
+            lookup.update(dict.fromkeys(missing))
+            lookup.update(model.objects.filter(**{f'{field}__in': missing})
+                          .values_list(field, 'id'))
+        return lookup
+
+    def skip(self, rows, done, batch_size):
+        """
+        Пропускает done загруженных до сбоя строк, запоминая, что они
+        затронули: их производные данные тоже нужно пересчитать.
+        """
+        skipped = islice(rows, done)
+        while True:
+            batch = list(islice(skipped, batch_size))
+            if not batch:
+                return
+            self.touch([row for _, row in batch])
+
+    def touch(self, rows):
+        """Запоминает авторов и группы постов или посты комментариев."""
+        rows = [row for row in rows if isinstance(row, dict)]
+        if self.kind == 'posts':
+            references = ((User, 'username', 'author'),
+                          (Group, 'slug', 'group'))
+        else:
+            references = ((Post, 'pk', 'post'),)
+        for model, field, key in references:
+            values = [row.get(key) for row in rows]
+            if model is Post:
+                values = [self.integer(value) for value in values]
+            lookup = self.resolve(model, field, values)
+            self.touched[model].update(
+                lookup[value] for value in values if lookup.get(value))
+
+    def load(self, batch):
+        """Проверяет пачку строк и сохраняет её одной транзакцией."""
+        rows = [row for _, row in batch if isinstance(row, dict)]
+        self.resolve(User, 'username', [row.get('author') for row in rows])
+        if self.kind == 'posts':
+            model, build = Post, self.build_post
+            self.resolve(Group, 'slug', [row.get('group') for row in rows])
+        else:
+            model, build = Comment, self.build_comment
+            self.resolve(Post, 'pk', [self.integer(row.get('post'))
+                                      for row in rows])
+        objects, errors = [], 0
+        for number, row in batch:
+            try:
+                if not isinstance(row, dict):
+                    raise ValueError('строка не разобрана')
+                objects.append(build(row))
+            except ValueError as error:
+                errors += 1
+                self.stderr.write(f'Строка {number}: {error}')
+        date_field = 'pub_date' if model is Post else 'created'
+        try:
+            with transaction.atomic(), \
+                    explicit_dates(model._meta.get_field(date_field)):
+                model.objects.bulk_create(objects)
+                references = Counter(obj.image.name for obj in objects
+                                     if model is Post and obj.image)
+                for name, count in references.items():
+                    blobs.acquire(name, count)
+        except IntegrityError:
+            self.release_copies(objects)
+            raise
+        if model is Post:
+            self.touched[User].update(obj.author_id for obj in objects)
+            self.touched[Group].update(obj.group_id for obj in objects
+                                       if obj.group_id is not None)
+        else:
+            self.touched[Post].update(obj.post_id for obj in objects)
+        return len(objects), errors
+
+    def integer(self, value):
+        try:
+            return int(value) if value not in (None, '') else None
+        except (TypeError, ValueError):
+            return None
+
+    def common(self, row):
+        """Поля, общие для постов и комментариев."""
+        text = str(row.get('text') or '').strip()
+        if not text:
+            raise ValueError('пустой текст')
+        author_id = self.lookups[User].get(row.get('author'))
+        if author_id is None:
+            raise ValueError(f'нет пользователя {row.get("author")!r}')
+        fields = {'text': text, 'author_id': author_id}
+        if row.get('id') not in (None, ''):
+            fields['id'] = self.integer(row['id'])
+            if fields['id'] is None:
+                raise ValueError(f'неверный id {row["id"]!r}')
+        return fields
+
+    def date(self, value):
+        if not value:
+            return timezone.now()
+        parsed = parse_datetime(str(value))
+        if parsed is None:
+            raise ValueError(f'неверная дата {value!r}')
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
+
+    def build_post(self, row):
+        fields = self.common(row)
+        group_id = None
+        if row.get('group'):
+            group_id = self.lookups[Group].get(row['group'])
+            if group_id is None:
+                raise ValueError(f'нет группы {row["group"]!r}')
+        return Post(group_id=group_id, pub_date=self.date(row.get('pub_date')),
+                    **self.image(row.get('image') or ''), **fields)
+
+    def build_comment(self, row):
+        fields = self.common(row)
+        post_id = self.lookups[Post].get(self.integer(row.get('post')))
+        if post_id is None:
+            raise ValueError(f'нет поста {row.get("post")!r}')
+        return Comment(post_id=post_id,
+                       created=self.date(row.get('created')), **fields)
+
+    def image(self, value):
+        """Поля картинки; файл из --images-dir копируется в хранилище."""
+        if not value or self.images_dir is None:
+            return {'image': value}
+        try:
+            path = safe_join(self.images_dir, value)
+            with open(path, 'rb') as source:
+                file_ = File(source, name=os.path.basename(path))
+                metadata = images.metadata(file_)
+                name = self.storage.save(f'posts/{file_.name}', file_)
+        except (OSError, SuspiciousFileOperation) as error:
+            raise ValueError(f'картинка {value!r}: {error}')
+        return dict(metadata, image=name)
+
+    def release_copies(self, objects):
+        """
+        Картинки, скопированные из --images-dir для несохранённой пачки,
+        отдаются prune_images: ссылка заводится и сразу снимается. Сам
+        файл удалять нельзя: в общем хранилище он мог быть и раньше.
+        """
+        if self.images_dir is None:
+            return
+        for name in {obj.image.name for obj in objects
+                     if isinstance(obj, Post) and obj.image}:
+            blobs.acquire(name)
+            blobs.release(name)
+
+    def rebuild_derived(self, batch_size):
+        """
+        bulk_create обходит сигналы: пересчитываем производные данные
+        затронутых авторов, групп и постов и сбрасываем их кэш.
+        """
+        model = Post if self.kind == 'posts' else Comment
+        statements = connection.ops.sequence_reset_sql(no_style(), [model])
+        if statements:
+            with connection.cursor() as cursor:
+                for statement in statements:
+                    cursor.execute(statement)
+        if self.kind == 'comments':
+            post_ids = self.touched[Post]
+            counters.reconcile_comments_count(batch_size, post_ids)
+            page_cache.bump(*map(page_cache.post_scope, post_ids))
+            return
+        author_ids, group_ids = self.touched[User], self.touched[Group]
+        counters.reconcile_user_stats(batch_size, author_ids)
+        for author_id in sorted(author_ids):
+            if not feeds.is_pull_author(author_id):
+                counts.invalidate_follow_counts(
+                    feeds.backfill_followers(author_id))
+        cache.delete_many(
+            [counts.ALL_POSTS_KEY]
+            + [counts.author_posts_key(pk) for pk in author_ids]
+            + [counts.group_posts_key(pk) for pk in group_ids])
+        page_cache.bump(page_cache.ALL_POSTS_SCOPE,
+                        *map(page_cache.author_scope, author_ids),
+                        *map(page_cache.group_scope, group_ids))
@@ -0,0 +1,18 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from posts import blobs
+
+
+class Command(BaseCommand):
+    help = 'Удаляет файлы картинок, на которые не ссылается ни один пост'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=float, default=24,
+                            help='Сколько часов файл должен пробыть '
+                                 'без ссылок')
+
+    def handle(self, *args, **options):
+        pruned = blobs.prune(timedelta(hours=options['grace_hours']))
+        self.stdout.write(self.style.SUCCESS(f'Удалено файлов: {pruned}'))
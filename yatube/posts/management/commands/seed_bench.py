@@ -0,0 +1,166 @@
+import random
+import time
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from faker import Faker
+from posts import counters, feeds
+from posts.bulk import explicit_dates
+from posts.models import Comment, Follow, Group, Post, User
+
+TEXT_POOL_SIZE = 1000
+
+
+def zipf_weights(size, exponent):
+    """Накопленные веса для выбора с перекосом: k-й элемент ~ 1 / k^s."""
+    return list(accumulate(1 / (rank ** exponent)
+                           for rank in range(1, size + 1)))
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими пользователями, группами, '
+            'постами, комментариями и подписками для нагрузочных замеров')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=200000)
+        parser.add_argument('--follows', type=int, default=20000)
+        parser.add_argument('--days', type=int, default=365,
+                            help='За сколько дней распределить посты')
+        parser.add_argument('--skew', type=float, default=1.1,
+                            help='Показатель закона Ципфа для авторов, '
+                                 'групп и популярных постов')
+        parser.add_argument('--prefix', default='bench',
+                            help='Префикс имён пользователей и групп')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.skew = options['skew']
+        faker = Faker('ru_RU')
+        faker.seed_instance(options['seed'])
+        self.texts = [faker.paragraph(nb_sentences=4)
+                      for _ in range(TEXT_POOL_SIZE)]
+        self.now = timezone.now()
+        self.period = timedelta(days=options['days'])
+        prefix = options['prefix']
+
+        user_ids = self.stage('users', self.create_users,
+                              prefix, options['users'])
+        group_ids = self.stage('groups', self.create_groups,
+                               prefix, options['groups'])
+        post_ids = self.stage('posts', self.create_posts,
+                              prefix, user_ids, group_ids, options['posts'])
+        self.stage('comments', self.create_comments,
+                   user_ids, post_ids, options['comments'])
+        self.stage('follows', self.create_follows,
+                   prefix, user_ids, options['follows'])
+        self.stage('counters', self.rebuild_derived)
+
+    def stage(self, name, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        self.stdout.write(f'{name}: {time.perf_counter() - start:.1f} с')
+        return result
+
+    def bulk_create(self, model, objects):
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) == self.batch_size:
+                with transaction.atomic():
+                    model.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+
+    def skewed(self, population):
+        """Генератор элементов population с перекосом к первым."""
+        cum_weights = zipf_weights(len(population), self.skew)
+        while True:
+            yield from self.random.choices(population,
+                                           cum_weights=cum_weights,
+                                           k=self.batch_size)
+
+    def random_date(self):
+        return self.now - self.period * self.random.random()
+
+    def create_users(self, prefix, total):
+        start = User.objects.filter(username__startswith=prefix).count()
+        password = make_password(None)
+        self.bulk_create(User, (
+            User(username=f'{prefix}{num}', password=password,
+                 first_name=f'Имя{num}', last_name=f'Фамилия{num}')
+            for num in range(start, start + total)))
+        user_ids = list(User.objects.filter(username__startswith=prefix)
+                        .values_list('id', flat=True))
+        self.random.shuffle(user_ids)
+        return user_ids
+
+    def create_groups(self, prefix, total):
+        start = Group.objects.filter(slug__startswith=prefix).count()
+        self.bulk_create(Group, (
+            Group(title=f'Группа {num}', slug=f'{prefix}-{num}',
+                  description=self.random.choice(self.texts))
+            for num in range(start, start + total)))
+        return list(Group.objects.filter(slug__startswith=prefix)
+                    .values_list('id', flat=True))
+
+    def create_posts(self, prefix, user_ids, group_ids, total):
+        authors = self.skewed(user_ids)
+        groups = self.skewed(group_ids + [None] * len(group_ids))
+        with explicit_dates(Post._meta.get_field('pub_date')):
+            self.bulk_create(Post, (
+                Post(text=self.random.choice(self.texts),
+                     author_id=next(authors),
+                     group_id=next(groups),
+                     pub_date=self.random_date())
+                for _ in range(total)))
+        return list(Post.objects.filter(author__username__startswith=prefix)
+                    .order_by('-pub_date').values_list('id', flat=True))
+
+    def create_comments(self, user_ids, post_ids, total):
+        if not post_ids:
+            return
+        posts = self.skewed(post_ids)
+        authors = self.skewed(user_ids)
+        with explicit_dates(Comment._meta.get_field('created')):
+            self.bulk_create(Comment, (
+                Comment(text=self.random.choice(self.texts),
+                        post_id=next(posts),
+                        author_id=next(authors),
+                        created=self.random_date())
+                for _ in range(total)))
+
+    def create_follows(self, prefix, user_ids, total):
+        authors = self.skewed(user_ids)
+        pairs = set()
+        attempts = 0
+        while len(pairs) < total and attempts < total * 10:
+            attempts += 1
+            user_id = self.random.choice(user_ids)
+            author_id = next(authors)
+            if user_id != author_id:
+                pairs.add((user_id, author_id))
+        existing = set(Follow.objects.filter(user__username__startswith=prefix)
+                       .values_list('user_id', 'author_id'))
+        self.bulk_create(Follow, (
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id, author_id in pairs - existing))
+
+    def rebuild_derived(self):
+        """bulk_create обходит сигналы: пересчитываем производные данные."""
+        counters.reconcile_user_stats(self.batch_size)
+        counters.reconcile_comments_count(self.batch_size)
+        feeds.rebuild(self.batch_size)
+        cache.clear()
@@ -0,0 +1,22 @@
+from django.db import migrations
+from django.db.models import Min
+
+
+def remove_duplicate_follows(apps, schema_editor):
+    """Оставляет по одной подписке на каждую пару (user, author)."""
+    Follow = apps.get_model('posts', 'Follow')
+    keep_ids = (Follow.objects.values('user', 'author')
+                .annotate(keep_id=Min('id')).values('keep_id'))
+    Follow.objects.exclude(id__in=keep_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_feeditem'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_follows,
+                             migrations.RunPython.noop),
+    ]
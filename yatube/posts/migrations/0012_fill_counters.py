@@ -0,0 +1,54 @@
+from itertools import islice
+
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+BATCH_SIZE = 1000
+
+
+def _count(queryset, field):
+    """Подзапрос количества записей queryset по полю field."""
+    return Coalesce(
+        Subquery(queryset.filter(**{field: OuterRef('pk')})
+                 .values(field).annotate(total=Count('pk'))
+                 .values('total'), output_field=IntegerField()),
+        0)
+
+
+def fill_counters(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Post.objects.update(comments_count=_count(Comment.objects, 'post'))
+    users = User.objects.annotate(
+        posts_total=_count(Post.objects, 'author'),
+        followers_total=_count(Follow.objects, 'author'),
+        following_total=_count(Follow.objects, 'user'),
+    ).values_list('pk', 'posts_total', 'followers_total', 'following_total')
+    stats = (UserStats(user_id=pk,
+                       posts_count=posts,
+                       followers_count=followers,
+                       following_count=following)
+             for pk, posts, followers, following in users.iterator())
+    while True:
+        batch = list(islice(stats, BATCH_SIZE))
+        if not batch:
+            break
+        UserStats.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0011_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 3.2.16 on 2026-10-17 06:18
+
+from django.db import migrations, models
+from django.db.models import Count
+
+import posts.storage
+
+
+def count_image_references(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    ImageBlob = apps.get_model('posts', 'ImageBlob')
+    references = (Post.objects.exclude(image='').order_by()
+                  .values_list('image').annotate(total=Count('pk')))
+    ImageBlob.objects.bulk_create(
+        (ImageBlob(name=name, references=total)
+         for name, total in references.iterator()),
+        batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_fill_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('references', models.PositiveIntegerField(default=0)),
+                ('released', models.DateTimeField(blank=True, help_text='Когда на файл перестали ссылаться', null=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, storage=posts.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Картинка'),
+        ),
+        migrations.RunPython(count_image_references,
+                             migrations.RunPython.noop),
+    ]
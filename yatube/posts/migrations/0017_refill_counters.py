@@ -0,0 +1,40 @@
+from django.db import migrations
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _count(queryset, field):
+    """
+    Подзапрос количества записей queryset по полю field.
+
+    order_by() убирает сортировку модели по умолчанию: иначе она попадает
+    в GROUP BY и каждая запись считается отдельно, как в 0012.
+    """
+    return Coalesce(
+        Subquery(queryset.filter(**{field: OuterRef('pk')})
+                 .order_by().values(field).annotate(total=Count('pk'))
+                 .values('total'), output_field=IntegerField()),
+        0)
+
+
+def refill_counters(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+    Post.objects.update(comments_count=_count(Comment.objects, 'post'))
+    UserStats.objects.update(
+        posts_count=_count(Post.objects, 'author'),
+        followers_count=_count(Follow.objects, 'author'),
+        following_count=_count(Follow.objects, 'user'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_comment_recent_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(refill_counters, migrations.RunPython.noop),
+    ]
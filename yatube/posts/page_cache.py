@@ -0,0 +1,208 @@
+"""
+ Кэш страниц с версиями областей.
+
+ Страница при отрисовке отмечает области (scope), от которых зависит:
+ все посты, группа, автор, пост. Вместе со страницей сохраняются версии
+ этих областей. Сигналы из posts/signals.py меняют версии при изменении
+ данных, и страница с прежними версиями больше не выдаётся. Поэтому
+ страницы хранятся долго (PAGE_CACHE_TIMEOUT) и не устаревают.
+
+ Те же версии служат валидаторами условного GET: ETag страницы — хеш
+ её ключа и версий, Last-Modified — время отрисовки. Пока версии не
+ изменились, браузер с сохранённой копией получает 304 без отрисовки.
+
+ Версия начинается со времени изменения. Страница, прочитанная с
+ реплики, сохраняется, только если данные реплики новее версий её
+ областей: иначе под новой версией остались бы старые данные.
+
+ Ленты зависят и от областей показанных постов (depends_on_posts):
+ комментарий меняет только область своего поста, а не все ленты.
+ Эти версии читаются после выборки постов, поэтому страница, у которой
+ какая-то версия новее начала отрисовки, не сохраняется.
+
+ Версии должны быть общими для процессов (см. core/cache.py): в кэше
+ памяти процесса они и страницы живут не дольше LOCAL_CACHE_TIMEOUT.
+"""
+
+import hashlib
+import time
+from functools import partial, wraps
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+from core import db_router
+from core.cache import shared_timeout
+
+ALL_POSTS_SCOPE = 'posts'
+GROUPS_SCOPE = 'groups'
+USERS_SCOPE = 'users'
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def author_scope(author_id):
+    return f'author:{author_id}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def _version_key(scope):
+    return f'pages:version:{scope}'
+
+
+def _new_version(at=None):
+    return f'{time.time() if at is None else at:.6f}:{uuid4().hex}'
+
+
+def _version_time(version):
+    try:
+        return float(version.partition(':')[0])
+    except ValueError:
+        return 0
+
+
+def bump(*scopes):
+    """Меняет версии областей, сбрасывая зависящие от них страницы."""
+    cache.set_many({_version_key(scope): _new_version() for scope in scopes},
+                   shared_timeout(None))
+
+
+def invalidate(*scopes):
+    """
+    Сбрасывает области сейчас и ещё раз после фиксации транзакции.
+
+    Без второго сброса запрос, прочитавший новую версию до фиксации,
+    сохранил бы под ней страницу со старыми данными.
+    """
+    bump(*scopes)
+    transaction.on_commit(partial(bump, *scopes))
+
+
+def _get_versions(scopes, at=None):
+    """Версии областей; недостающие создаются со временем at."""
+    keys = {_version_key(scope): scope for scope in scopes}
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    for key in missing:
+        cache.add(key, _new_version(at), shared_timeout(None))
+    if missing:
+        versions.update(cache.get_many(missing))
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def depends_on(request, *scopes):
+    """
+    Отмечает, что страница зависит от областей scopes.
+
+    Вызывается до чтения данных: тогда изменение, совпавшее с отрисовкой,
+    поменяет версию уже после её чтения и страница не будет выдана.
+    """
+    versions = getattr(request, 'page_cache_versions', None)
+    if versions is not None:
+        versions.update(_get_versions(scopes, request.page_cache_started))
+
+
+def depends_on_posts(request, posts):
+    """
+    Отмечает, что страница зависит от областей постов posts.
+
+    Вызывается после выборки постов: карточки показывают их комментарии.
+    """
+    depends_on(request, *(
+        post_scope(post['id'] if isinstance(post, dict) else post.pk)
+        for post in posts))
+
+
+def _is_fresh(versions):
+    current = cache.get_many([_version_key(scope) for scope in versions])
+    return all(current.get(_version_key(scope)) == version
+               for scope, version in versions.items())
+
+
+def _is_replicated(versions, started):
+    """
+    Видны ли в данных, с которыми отрисована страница, все версии.
+
+    Версия новее начала отрисовки могла смениться уже после чтения
+    данных, а данные реплики должны быть новее всех версий.
+    """
+    freshness = db_router.read_freshness()
+    return all(
+        _version_time(version) <= started
+        and (freshness is None or _version_time(version) <= freshness)
+        for version in versions.values())
+
+
+def _page_key(request, view_name):
+    user = request.user
+    if user.is_authenticated:
+        # Форма комментария содержит CSRF-токен из cookie браузера
+        viewer = '{}:{}'.format(
+            user.pk, request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''))
+    else:
+        viewer = 'anonymous'
+    digest = hashlib.md5(
+        f'{request.get_full_path()}|{viewer}'.encode()).hexdigest()
+    return f'pages:{view_name}:{digest}'
+
+
+def _set_validators(request, response, key, versions):
+    """ETag и Last-Modified страницы; браузер проверяет их при показе."""
+    content = key + '|' + '|'.join(
+        f'{scope}={version}' for scope, version in sorted(versions.items()))
+    response['ETag'] = quote_etag(hashlib.md5(content.encode()).hexdigest())
+    response['Last-Modified'] = http_date()
+    if request.user.is_authenticated:
+        patch_cache_control(response, private=True, no_cache=True)
+    else:
+        patch_cache_control(response, no_cache=True)
+
+
+def _conditional(request, response):
+    return get_conditional_response(
+        request, etag=response['ETag'],
+        last_modified=parse_http_date_safe(response['Last-Modified']),
+        response=response)
+
+
+def versioned_cache_page(view):
+    """
+    Кэширует ответы представления на GET и HEAD, пока не изменятся
+    версии отмеченных в нём областей, и отвечает 304 на условные
+    запросы страниц с теми же версиями.
+
+    Гости получают общую копию страницы, пользователи — свою.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view(request, *args, **kwargs)
+        key = _page_key(request, view.__name__)
+        entry = cache.get(key)
+        if entry is not None and _is_fresh(entry[0]):
+            return _conditional(request, entry[1])
+        request.page_cache_versions = {}
+        # Округление как в версиях: созданные при отрисовке не новее
+        request.page_cache_started = round(time.time(), 6)
+        response = view(request, *args, **kwargs)
+        versions = request.page_cache_versions
+        if (response.status_code != 200 or response.streaming
+                or not versions
+                or not _is_replicated(versions,
+                                      request.page_cache_started)):
+            return response
+        _set_validators(request, response, key, versions)
+        if not response.cookies:
+            cache.set(key, (versions, response),
+                      shared_timeout(settings.PAGE_CACHE_TIMEOUT))
+        return _conditional(request, response)
+    return wrapper
@@ -0,0 +1,303 @@
+import base64
+import binascii
+import hashlib
+import heapq
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from .counts import ALL_POSTS_KEY, cached_count
+
+CURSOR_SEPARATOR = '|'
+
+
+def key_values(obj, names):
+    """Значения полей ключа записи: объекта модели или словаря values()."""
+    if isinstance(obj, dict):
+        return tuple(obj[name] for name in names)
+    return tuple(getattr(obj, name) for name in names)
+
+
+def key_condition(key, values, lookup):
+    """Строит условие (a, b) < (x, y) для произвольной длины ключа."""
+    condition = Q()
+    for index, name in enumerate(key):
+        step = Q(**{f'{name}__{lookup}': values[index]})
+        for prev_name, prev_value in zip(key[:index], values):
+            step &= Q(**{prev_name: prev_value})
+        condition |= step
+    return condition
+
+
+class FeedPaginator(Paginator):
+    """
+    Постраничный вывод по номеру с кэшируемым числом записей.
+
+    Если передан count_key, количество записей берётся из кэша
+    (см. posts/counts.py), а не считается COUNT(*) на каждый запрос.
+    """
+    def __init__(self, object_list, per_page, count_key=None):
+        super().__init__(object_list, per_page)
+        self.count_key = count_key
+
+    @cached_property
+    def count(self):
+        if self.count_key is None:
+            return super().count
+        return cached_count(self.count_key, self.object_list)
+
+
+class CursorPage(Page):
+    """Страница ленты, полученная по курсору, а не по номеру."""
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        super().__init__(object_list, None, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return '<Cursor page of %s items>' % len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    @property
+    def next_cursor(self):
+        if self.has_next() and self.object_list:
+            return self.paginator.encode_cursor(self.object_list[-1])
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous() and self.object_list:
+            return self.paginator.encode_cursor(self.object_list[0])
+        return None
+
+
+class CursorPaginator(Paginator):
+    """
+    Постраничный вывод по ключу (по умолчанию (pub_date, id)).
+
+    Записи выбираются условием по ключу вместо OFFSET, поэтому любая
+    страница строится за одинаковое время, а COUNT(*) не выполняется.
+    Свойства count, num_pages и page_range для этого пагинатора
+    не используются. Записями могут быть и словари из values().
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, per_page, key=('pub_date', 'id')):
+        super().__init__(object_list, per_page)
+        self.key = key
+
+    def encode_cursor(self, obj):
+        values = key_values(obj, self.key)
+        raw = CURSOR_SEPARATOR.join(map(str, values)).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, token):
+        """Разбирает курсор; для повреждённого курсора возвращает None."""
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        except (binascii.Error, UnicodeError, ValueError):
+            return None
+        values = raw.split(CURSOR_SEPARATOR)
+        if len(values) != len(self.key):
+            return None
+        try:
+            return [self._key_field(name).to_python(value)
+                    for name, value in zip(self.key, values)]
+        except ValidationError:
+            return None
+
+    def _key_field(self, name):
+        """Поле ключа: поле модели или аннотация queryset."""
+        annotations = self.object_list.query.annotations
+        if name in annotations:
+            return annotations[name].output_field
+        return self.object_list.model._meta.get_field(name)
+
+    def _key_filter(self, values, lookup):
+        return key_condition(self.key, values, lookup)
+
+    def _stream(self, queryset, descending, values):
+        """До per_page + 1 записей queryset после курсора в порядке ключа."""
+        prefix = '-' if descending else ''
+        queryset = queryset.order_by(*(prefix + name for name in self.key))
+        if values is not None:
+            queryset = queryset.filter(
+                self._key_filter(values, 'lt' if descending else 'gt'))
+        return list(queryset[:self.per_page + 1])
+
+    def _select(self, descending, values):
+        return self._stream(self.object_list, descending, values)
+
+    def page_after(self, token=None):
+        values = self.decode_cursor(token) if token else None
+        objects = self._select(True, values)
+        return CursorPage(objects[:self.per_page], self,
+                          has_next=len(objects) > self.per_page,
+                          has_previous=values is not None)
+
+    def page_before(self, token):
+        values = self.decode_cursor(token)
+        if values is None:
+            return self.page_after()
+        objects = self._select(False, values)
+        has_previous = len(objects) > self.per_page
+        objects = objects[:self.per_page]
+        objects.reverse()
+        return CursorPage(objects, self,
+                          has_next=True,
+                          has_previous=has_previous)
+
+    def get_cursor_page(self, after=None, before=None):
+        if before:
+            return self.page_before(before)
+        return self.page_after(after)
+
+
+class MergedCursorPaginator(CursorPaginator):
+    """
+    Постраничный вывод по курсору из нескольких отсортированных лент.
+
+    Из каждого источника берётся не больше per_page + 1 записей после
+    курсора, затем потоки сливаются heapq.merge по ключу. Повторы
+    (одна запись в нескольких источниках) отбрасываются по pk.
+    """
+
+    def __init__(self, sources, per_page, key=('pub_date', 'id')):
+        super().__init__(sources[0], per_page, key=key)
+        self.sources = sources
+
+    def _select(self, descending, values):
+        streams = [self._stream(source, descending, values)
+                   for source in self.sources]
+        merged = heapq.merge(*streams,
+                             key=lambda obj: key_values(obj, self.key),
+                             reverse=descending)
+        objects, seen = [], set()
+        for obj in merged:
+            pk = obj['id'] if isinstance(obj, dict) else obj.pk
+            if pk in seen:
+                continue
+            seen.add(pk)
+            objects.append(obj)
+            if len(objects) > self.per_page:
+                break
+        return objects
+
+
+class ChangeListPaginator(Paginator):
+    """
+    Постраничный вывод списка постов в админке.
+
+    Без фильтров число постов берётся из кэша счётчиков, с фильтрами
+    считается не дальше ADMIN_COUNT_LIMIT записей, но не меньше чем до
+    страницы после запрошенной number. Если предел достигнут, число
+    приблизительное (is_approximate), а следующая страница всё равно
+    доступна: с каждой страницей предел отодвигается. При порядке по ключу
+    (по умолчанию (pub_date, id)) граница каждой показанной страницы
+    запоминается в кэше, и следующая страница выбирается условием по
+    ключу от неё, а не через OFFSET.
+    """
+    def __init__(self, object_list, per_page, orphans=0,
+                 allow_empty_first_page=True, key=('pub_date', 'id'),
+                 number=1):
+        super().__init__(object_list, per_page, orphans,
+                         allow_empty_first_page)
+        self.key = key
+        self.count_limit = max(settings.ADMIN_COUNT_LIMIT,
+                               (number + 1) * per_page)
+        self.is_approximate = False
+
+    @cached_property
+    def count(self):
+        if not self.object_list.query.where:
+            return cached_count(ALL_POSTS_KEY, self.object_list)
+        count = self.object_list.order_by()[:self.count_limit + 1].count()
+        self.is_approximate = count > self.count_limit
+        return count
+
+    @cached_property
+    def descending(self):
+        """
+        True или False, если список упорядочен по ключу по убыванию или
+        по возрастанию, и None при любом другом порядке.
+        """
+        order_by = tuple(self.object_list.query.order_by)
+        for descending, prefix in ((True, '-'), (False, '')):
+            if order_by == tuple(prefix + name for name in self.key):
+                return descending
+        return None
+
+    def _boundary_key(self, number):
+        query = hashlib.md5(str(self.object_list.query).encode()).hexdigest()
+        return f'admin:boundary:{query}:{self.per_page}:{number}'
+
+    def page(self, number):
+        number = self.validate_number(number)
+        boundary = None
+        if number > 1 and self.descending is not None:
+            boundary = cache.get(self._boundary_key(number - 1))
+        if boundary is None:
+            page = super().page(number)
+            objects = list(page.object_list)
+        else:
+            lookup = 'lt' if self.descending else 'gt'
+            objects = list(self.object_list.filter(
+                key_condition(self.key, boundary, lookup))[:self.per_page])
+        if objects and self.descending is not None:
+            cache.set(self._boundary_key(number),
+                      key_values(objects[-1], self.key),
+                      settings.ADMIN_BOUNDARY_CACHE_TIMEOUT)
+        return self._get_page(objects, number, self)
+
+
+def paginate(request, queryset, count_key=None, per_page=None,
+             cursor_key=('pub_date', 'id')):
+    """
+    Возвращает страницу ленты для запроса.
+
+    Параметры ?after= и ?before= включают постраничный вывод по курсору,
+    ?page= — обычный постраничный вывод по номеру. Без параметров режим
+    выбирается настройкой POST_PAGINATION. Со страницы номер
+    POST_CURSOR_FROM_PAGE у страницы есть next_cursor: ссылка «Следующая»
+    ведёт в вывод по курсору. count_key — ключ кэша
+    количества записей ленты для постраничного вывода по номеру,
+    cursor_key — поля ключа для вывода по курсору.
+
+    Вместо queryset можно передать список querysets: несколько
+    источников всегда сливаются постранично по курсору.
+    """
+    per_page = per_page or settings.POST_PER_PAGE
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    if isinstance(queryset, (list, tuple)):
+        if len(queryset) > 1:
+            paginator = MergedCursorPaginator(queryset, per_page,
+                                              key=cursor_key)
+            return paginator.get_cursor_page(after=after, before=before)
+        queryset = queryset[0]
+    page_number = request.GET.get('page')
+    use_cursor = after or before or (
+        page_number is None and settings.POST_PAGINATION == 'cursor')
+    if use_cursor:
+        paginator = CursorPaginator(queryset, per_page, key=cursor_key)
+        return paginator.get_cursor_page(after=after, before=before)
+    paginator = FeedPaginator(queryset, per_page, count_key=count_key)
+    page = paginator.get_page(page_number)
+    if page.has_next() and page.number >= settings.POST_CURSOR_FROM_PAGE:
+        # Глубокие смещения дороги: дальше листаем по ключу
+        page.object_list = list(page.object_list)
+        page.next_cursor = CursorPaginator(
+            queryset, per_page, key=cursor_key).encode_cursor(
+            page.object_list[-1])
+    return page
@@ -0,0 +1,170 @@
+"""
+ Полнотекстовый поиск по постам на SQLite FTS5.
+
+ Таблица posts_post_fts индексирует Post.text и хранит только индекс:
+ текст берётся из posts_post (external content). Триггеры на
+ posts_post обновляют индекс при любых изменениях, в том числе при
+ bulk_create и update, которые обходят сигналы. Пересоздание таблицы
+ posts_post миграциями удаляет её триггеры, поэтому install вызывается
+ после каждого migrate (см. PostsConfig.ready).
+
+ Результаты упорядочены по BM25 и листаются по курсору (score, id).
+ На других СУБД индекса нет и поиск не работает (is_available).
+"""
+
+import re
+
+from django.db import connection
+from django.db.models import FloatField
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+from .paginators import CursorPaginator
+
+FTS_TABLE = 'posts_post_fts'
+SNIPPET_WORDS = 24
+# Метки совпадений в snippet(); заменяются на <mark> после экранирования
+MARK_START, MARK_END = '\x02', '\x03'
+
+SCHEMA = (
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        text, content='posts_post', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2')""",
+    f"""CREATE TRIGGER IF NOT EXISTS posts_post_fts_insert
+        AFTER INSERT ON posts_post BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS posts_post_fts_delete
+        AFTER DELETE ON posts_post BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+            VALUES ('delete', old.id, old.text);
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS posts_post_fts_update
+        AFTER UPDATE OF text ON posts_post BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+            VALUES ('delete', old.id, old.text);
+            INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+        END""",
+)
+DROP_SCHEMA = (
+    'DROP TRIGGER IF EXISTS posts_post_fts_insert',
+    'DROP TRIGGER IF EXISTS posts_post_fts_delete',
+    'DROP TRIGGER IF EXISTS posts_post_fts_update',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+)
+
+SEARCH_SQL = f"""
+    SELECT rowid, -bm25({FTS_TABLE}) AS score,
+           snippet({FTS_TABLE}, 0, %s, %s, '…', %s)
+    FROM {FTS_TABLE}
+    WHERE {FTS_TABLE} MATCH %s {{condition}}
+    ORDER BY score {{order}}, rowid {{order}}
+    LIMIT %s
+"""
+
+
+def is_available(using=connection):
+    return using.vendor == 'sqlite'
+
+
+def install(using=connection, rebuild=False, repair=False):
+    """
+    Создаёт индекс и триггеры, если их нет; rebuild — переиндексирует.
+
+    repair — только вернуть триггеры уже созданному индексу.
+    """
+    if not is_available(using):
+        return
+    if repair and FTS_TABLE not in using.introspection.table_names():
+        return
+    with using.cursor() as cursor:
+        for statement in SCHEMA:
+            cursor.execute(statement)
+        if rebuild:
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def uninstall(using=connection):
+    if not is_available(using):
+        return
+    with using.cursor() as cursor:
+        for statement in DROP_SCHEMA:
+            cursor.execute(statement)
+
+
+def match_expression(query):
+    """
+    Запрос пользователя в синтаксисе FTS5: все слова по префиксу.
+
+    Слова берутся в кавычки, поэтому операторы FTS5 во вводе не
+    работают и не вызывают ошибок разбора.
+    """
+    words = re.findall(r'\w+', query)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def matching_ids(query):
+    """Подзапрос id постов, подходящих под query (для фильтра id__in)."""
+    return RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} '
+                  'MATCH %s', [match_expression(query)])
+
+
+def highlight(snippet):
+    """Экранированный фрагмент текста с совпадениями в <mark>."""
+    return mark_safe(escape(snippet).replace(MARK_START, '<mark>')
+                     .replace(MARK_END, '</mark>'))
+
+
+class SearchPaginator(CursorPaginator):
+    """
+    Постраничный вывод результатов поиска по курсору (score, id).
+
+    score — BM25 со знаком минус: чем больше, тем лучше совпадение.
+    Посты страницы получают атрибуты search_score и search_snippet.
+    """
+
+    def __init__(self, query, per_page):
+        super().__init__(Post.objects.all(), per_page,
+                         key=('search_score', 'id'))
+        self.match = match_expression(query)
+
+    def _key_field(self, name):
+        if name == 'search_score':
+            return FloatField()
+        return super()._key_field(name)
+
+    def _sql_condition(self, values, lookup):
+        """Условие по курсору (score, id) для SEARCH_SQL и его параметры."""
+        if values is None:
+            return '', []
+        score, post_id = values
+        operator = '<' if lookup == 'lt' else '>'
+        return (f'AND (-bm25({FTS_TABLE}) {operator} %s OR '
+                f'(-bm25({FTS_TABLE}) = %s AND rowid {operator} %s))',
+                [score, score, post_id])
+
+    def _select(self, descending, values):
+        if not self.match:
+            return []
+        sql_condition, params = self._sql_condition(
+            values, 'lt' if descending else 'gt')
+        sql = SEARCH_SQL.format(condition=sql_condition,
+                                order='DESC' if descending else 'ASC')
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [MARK_START, MARK_END, SNIPPET_WORDS,
+                                 self.match, *params, self.per_page + 1])
+            rows = cursor.fetchall()
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [post_id for post_id, _, _ in rows])
+        results = []
+        for post_id, score, snippet in rows:
+            post = posts.get(post_id)
+            if post is None:
+                continue
+            post.search_score = score
+            post.search_snippet = highlight(snippet)
+            results.append(post)
+        return results
@@ -0,0 +1,167 @@
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import (blobs, counters, counts, feeds, images, page_cache,
+               thumbnails)
+from .models import Comment, Follow, Group, Post
+
+USER_NAME_FIELDS = ('username', 'first_name', 'last_name')
+
+
+def _invalidate_post_pages(post, group_ids):
+    page_cache.invalidate(
+        page_cache.ALL_POSTS_SCOPE,
+        page_cache.post_scope(post.pk),
+        page_cache.author_scope(post.author_id),
+        *(page_cache.group_scope(group_id)
+          for group_id in group_ids if group_id is not None))
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous_post(sender, instance, **kwargs):
+    """
+    Запоминает прежние группу и картинку поста: счётчик прежней группы
+    тоже сбрасывается, а миниатюры создаются только для новой картинки.
+    """
+    instance._previous_group_id = None
+    instance._previous_image = None
+    if instance.pk is not None:
+        instance._previous_group_id, instance._previous_image = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group_id', 'image').first() or (None, None))
+
+
+@receiver(pre_save, sender=Post)
+def fill_image_metadata(sender, instance, **kwargs):
+    """
+    Размеры загруженной картинки читаются при сохранении, а не при
+    показе. Картинку, заданную именем файла, дозаполняет команда
+    fill_image_metadata.
+    """
+    image = instance.image
+    if image and not image._committed:
+        fields = images.metadata(image)
+    elif image.name != instance._previous_image:
+        fields = images.EMPTY
+    else:
+        return
+    for field, value in fields.items():
+        setattr(instance, field, value)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    group_ids = {instance.group_id,
+                 getattr(instance, '_previous_group_id', None)}
+    follower_ids = ()
+    if created:
+        counters.change_user_stats(instance.author_id, posts_count=1)
+        follower_ids = feeds.push_post(instance)
+    previous_image = getattr(instance, '_previous_image', None)
+    if instance.image.name != previous_image:
+        if previous_image:
+            blobs.release(previous_image)
+        if instance.image:
+            blobs.acquire(instance.image.name)
+            transaction.on_commit(partial(thumbnails.schedule, instance))
+    counts.invalidate_post_counts(instance.author_id, group_ids,
+                                  follower_ids)
+    _invalidate_post_pages(instance, group_ids)
+
+
+@receiver(pre_delete, sender=Post)
+def remember_feed_users(sender, instance, **kwargs):
+    """Записи лент удаляются вместе с постом, их владельцев берём до."""
+    instance._feed_user_ids = feeds.feed_user_ids(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.change_user_stats(instance.author_id, posts_count=-1)
+    if instance.image:
+        blobs.release(instance.image.name)
+    counts.invalidate_post_counts(instance.author_id, {instance.group_id},
+                                  getattr(instance, '_feed_user_ids', ()))
+    _invalidate_post_pages(instance, {instance.group_id})
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user_stats(instance.user_id, following_count=1)
+        counters.change_user_stats(instance.author_id, followers_count=1)
+        feeds.backfill(instance.user_id, instance.author_id)
+    counts.invalidate_follow_count(instance.user_id)
+    page_cache.invalidate(page_cache.author_scope(instance.user_id),
+                          page_cache.author_scope(instance.author_id))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.change_user_stats(instance.user_id, following_count=-1)
+    counters.change_user_stats(instance.author_id, followers_count=-1)
+    feeds.trim(instance.user_id, instance.author_id)
+    counts.invalidate_follow_count(instance.user_id)
+    if feeds.is_back_to_push(instance.author_id):
+        counts.invalidate_follow_counts(
+            feeds.backfill_followers(instance.author_id))
+    page_cache.invalidate(page_cache.author_scope(instance.user_id),
+                          page_cache.author_scope(instance.author_id))
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change_comments_count(instance.post_id, 1)
+    # Страница поста и ленты с его карточкой зависят от области поста
+    page_cache.invalidate(page_cache.post_scope(instance.post_id))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change_comments_count(instance.post_id, -1)
+    page_cache.invalidate(page_cache.post_scope(instance.post_id))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    page_cache.invalidate(page_cache.GROUPS_SCOPE,
+                          page_cache.group_scope(instance.pk))
+
+
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL)
+def remember_previous_names(sender, instance, update_fields=None,
+                            **kwargs):
+    """Запоминает показанные на страницах поля: имя и полное имя."""
+    instance._previous_names = None
+    if instance.pk is None or (
+            update_fields is not None
+            and not set(update_fields) & set(USER_NAME_FIELDS)):
+        return
+    instance._previous_names = (
+        sender.objects.filter(pk=instance.pk)
+        .values_list(*USER_NAME_FIELDS).first())
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_saved(sender, instance, created, **kwargs):
+    """
+    Имена пользователей есть на всех страницах. Регистрация и вход
+    их не меняют: страницы сбрасываются, только если имя изменилось.
+    """
+    previous = getattr(instance, '_previous_names', None)
+    names = tuple(getattr(instance, field) for field in USER_NAME_FIELDS)
+    if created or previous is None or previous == names:
+        return
+    page_cache.invalidate(page_cache.USERS_SCOPE)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def user_deleted(sender, instance, **kwargs):
+    page_cache.invalidate(page_cache.USERS_SCOPE)
@@ -0,0 +1,73 @@
+"""
+ Хранилище картинок постов с адресацией по содержимому.
+
+ Имя файла — SHA-256 его содержимого: posts/ab/abcdef….png. Хеш
+ считается по частям прямо при записи загружаемого файла, поэтому файл
+ читается один раз. Одинаковые картинки хранятся одним файлом, ссылки
+ на него считает модель ImageBlob (posts/blobs.py). Содержимое файла с
+ таким именем никогда не меняется, поэтому его можно отдавать с
+ заголовком Cache-Control: immutable.
+"""
+
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+
+CONTENT_ADDRESSED_RE = re.compile(r'^posts/[0-9a-f]{2}/[0-9a-f]{64}')
+
+
+def is_content_addressed(name):
+    """Имя картинки или её варианта с хешем содержимого."""
+    return CONTENT_ADDRESSED_RE.match(name) is not None
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    @staticmethod
+    def _touch(path):
+        """
+        Отмечает повторную загрузку существующего файла временем
+        изменения: prune_images не удалит файл, тронутый после того, как
+        на него перестали ссылаться. Если файла уже нет, он пишется.
+        """
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def get_available_name(self, name, max_length=None):
+        # Совпадение имён означает совпадение содержимого
+        return name
+
+    def _save(self, name, content):
+        directory = posixpath.dirname(name)
+        extension = posixpath.splitext(name)[1].lower()
+        os.makedirs(self.path(directory), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.path(directory),
+                                         suffix='.upload')
+        try:
+            digest = hashlib.sha256()
+            with os.fdopen(fd, 'wb') as temp_file:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    temp_file.write(chunk)
+            hexdigest = digest.hexdigest()
+            name = posixpath.join(directory, hexdigest[:2],
+                                  hexdigest + extension)
+            full_path = self.path(name)
+            if self._touch(full_path):
+                os.remove(temp_path)
+                return name
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            if self.file_permissions_mode is not None:
+                os.chmod(temp_path, self.file_permissions_mode)
+            os.replace(temp_path, full_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return name
@@ -0,0 +1,61 @@
+import hashlib
+
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+from posts import thumbnails
+
+register = template.Library()
+
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+
+
+def card_version(post):
+    """Версия карточки: меняется при любой правке показанных в ней полей."""
+    group_slug = post.group.slug if post.group_id else ''
+    comments = [f'{comment.pk}:{comment.author.username}:{comment.text}'
+                for comment in getattr(post, 'latest_comments', ())]
+    content = '|'.join((
+        post.text, post.image.name or '', post.pub_date.isoformat(),
+        group_slug, post.author.username, post.author.get_full_name(),
+        str(post.comments_count), *comments))
+    return hashlib.md5(content.encode()).hexdigest()
+
+
+def card_key(post, show_author):
+    variant = 'full' if show_author else 'short'
+    return f'posts:card:{post.pk}:{variant}:{card_version(post)}'
+
+
+@register.simple_tag
+def post_cards(page_obj, show_author=True):
+    """
+    Список отрисованных карточек постов страницы.
+
+    Готовые карточки берутся из кэша одним get_many, отрисовываются
+    только недостающие, а их миниатюры находятся одним пакетом. Ключ
+    содержит версию содержимого, поэтому правка поста сама выбирает
+    новую карточку. Карточки с заглушкой вместо ещё не созданной
+    миниатюры не кэшируются.
+    """
+    posts = list(page_obj)
+    keys = [card_key(post, show_author) for post in posts]
+    cards = cache.get_many(keys)
+    ready = {}
+    card_template = get_template(CARD_TEMPLATE)
+    images = thumbnails.ready_thumbnails(
+        [post.image for key, post in zip(keys, posts) if key not in cards])
+    for key, post in zip(keys, posts):
+        if key in cards:
+            continue
+        post_images = images.get(post.image.name, {})
+        cards[key] = card_template.render({'post': post,
+                                           'images': post_images,
+                                           'show_author': show_author})
+        if not post.image or thumbnails.is_complete(post_images):
+            ready[key] = cards[key]
+    if ready:
+        cache.set_many(ready, settings.POST_CARD_CACHE_TIMEOUT)
+    return [mark_safe(cards[key]) for key in keys]
@@ -0,0 +1,48 @@
+from django import template
+from django.conf import settings
+
+from posts import thumbnails
+
+register = template.Library()
+
+MIME_TYPES = {'WEBP': 'image/webp', 'JPEG': 'image/jpeg',
+              'PNG': 'image/png', 'GIF': 'image/gif'}
+
+
+def srcset(images):
+    return ', '.join(f'{image.url} {image.width}w' for image in images)
+
+
+@register.inclusion_tag('posts/includes/post_image.html')
+def post_picture(image, ready=None, lazy=True):
+    """
+    Картинка поста тегом <picture> с srcset по ширинам для каждого
+    формата; последний формат — запасной для <img>.
+
+    ready — готовые варианты из thumbnails.ready_thumbnails; если не
+    переданы, ищутся здесь. Пока готовы не все варианты, выводится
+    заглушка. Ширина и высота <img> берутся из настроек вариантов, файлы
+    не открываются; lazy=False — для картинки в начале страницы.
+    """
+    if not image:
+        return {'image': None}
+    largest = thumbnails.variants()[-1]
+    context = {'image': image, 'lazy': lazy,
+               'width': largest.width, 'height': largest.height}
+    if ready is None:
+        ready = thumbnails.ready_thumbnails([image])[image.name]
+    if not thumbnails.is_complete(ready):
+        return dict(context, fallback=None)
+    by_format = {}
+    for variant in thumbnails.variants():
+        by_format.setdefault(variant.format, []).append(ready[variant.name])
+    *preferred, fallback_format = by_format
+    return dict(
+        context,
+        sizes=settings.POST_IMAGE_SIZES,
+        sources=[{'type': MIME_TYPES[image_format],
+                  'srcset': srcset(by_format[image_format])}
+                 for image_format in preferred],
+        fallback=by_format[fallback_format][-1],
+        fallback_srcset=srcset(by_format[fallback_format]),
+    )
@@ -0,0 +1,90 @@
+from unittest import mock
+
+from django.contrib.admin.sites import site
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class PostAdminTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username='admin')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        Post.objects.bulk_create(
+            Post(author=cls.admin, group=cls.group, text=f'Пост {num}')
+            for num in range(25))
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.admin)
+        patcher = mock.patch.object(site._registry[Post], 'list_per_page',
+                                    10)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def changelist(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('admin:posts_post_changelist'), params)
+        return response, [query['sql'] for query in queries.captured_queries
+                          if 'FROM "posts_post"' in query['sql']]
+
+    def test_pages_after_first_use_keyset(self):
+        """Следующие страницы выбираются по ключу, а не через OFFSET"""
+        response, queries = self.changelist()
+        first = list(response.context['cl'].result_list)
+        self.assertTrue(any('OFFSET' not in sql for sql in queries))
+        response, queries = self.changelist(p=2)
+        second = list(response.context['cl'].result_list)
+        self.assertFalse([sql for sql in queries if 'OFFSET' in sql])
+        self.assertFalse([sql for sql in queries if 'COUNT(' in sql])
+        expected = list(Post.objects.all()[:20])
+        self.assertEqual(first + second, expected)
+
+    def test_joined_fetch(self):
+        """Автор и группа выбираются одним запросом со списком"""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('admin:posts_post_changelist'))
+        tables = [query['sql'].split(' FROM ')[1].split()[0]
+                  for query in queries.captured_queries
+                  if ' FROM ' in query['sql']]
+        self.assertNotIn('"posts_group"', tables)
+        # Пользователь запроса; авторы постов приходят в JOIN
+        self.assertEqual(tables.count('"auth_user"'), 1)
+
+    @override_settings(ADMIN_COUNT_LIMIT=12)
+    def test_filtered_count_is_bounded(self):
+        """Отфильтрованный список считается до предела и помечается"""
+        response, _ = self.changelist(q='Пост')
+        cl = response.context['cl']
+        self.assertTrue(cl.paginator.is_approximate)
+        self.assertContains(response, 'больше 20')
+        self.assertEqual(cl.paginator.num_pages, 3)
+
+    @override_settings(ADMIN_COUNT_LIMIT=12)
+    def test_filtered_list_is_not_cut_off(self):
+        """За пределом подсчёта страницы остаются доступны"""
+        seen = []
+        for number in (1, 2, 3):
+            response, _ = self.changelist(q='Пост', p=number)
+            self.assertEqual(response.status_code, 200)
+            seen += list(response.context['cl'].result_list)
+        self.assertEqual(len(seen), 25)
+        self.assertFalse(response.context['cl'].paginator.is_approximate)
+        self.assertContains(response, '25 ')
+
+    def test_autocomplete_widgets(self):
+        """Автор и группа выбираются автодополнением"""
+        response = self.client.get(reverse('admin:posts_post_add'))
+        for field in ('author', 'group'):
+            with self.subTest(field=field):
+                self.assertContains(response, f'data-field-name="{field}"')
@@ -0,0 +1,89 @@
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.signals import request_finished, request_started
+from django.db import close_old_connections
+from django.test import TestCase
+from posts.models import Comment, FeedItem, Follow, Group, Post, UserStats
+from posts.urls import urlpatterns
+
+
+class BenchCommandsTests(TestCase):
+    def setUp(self):
+        # WSGIHandler закрывает соединение после запроса, что оборвало бы
+        # транзакцию теста; так же поступает django.test.Client
+        request_started.disconnect(close_old_connections)
+        request_finished.disconnect(close_old_connections)
+
+    def tearDown(self):
+        request_started.connect(close_old_connections)
+        request_finished.connect(close_old_connections)
+
+    def test_seed_bench_creates_consistent_data(self):
+        """seed_bench создаёт данные и пересчитывает производные"""
+        call_command('seed_bench', users=20, groups=3, posts=200,
+                     comments=300, follows=40, seed=1, batch_size=50,
+                     stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 300)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(FeedItem.objects.exists())
+        self.assertEqual(
+            sum(UserStats.objects.values_list('posts_count', flat=True)),
+            200)
+
+    def test_bench_views_reports_every_route(self):
+        """bench_views выдаёт замеры по всем адресам posts/urls.py"""
+        call_command('seed_bench', users=10, groups=2, posts=50,
+                     comments=50, follows=20, seed=1, stdout=StringIO())
+        out = StringIO()
+        call_command('bench_views', requests=3, warmup=1, format='json',
+                     stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(len(report['routes']), len(urlpatterns))
+        for route in report['routes']:
+            with self.subTest(route=route['route']):
+                self.assertGreaterEqual(route['p99_ms'], route['p50_ms'])
+                self.assertEqual(sum(route['statuses'].values()), 3)
+                self.assertTrue(all(status.startswith(('200', '302'))
+                                    for status in route['statuses']))
+
+    def test_bench_views_keeps_data(self):
+        """После замеров подписки, ленты и счётчики не меняются"""
+        call_command('seed_bench', users=10, groups=2, posts=50,
+                     comments=50, follows=20, seed=1, stdout=StringIO())
+
+        def snapshot():
+            return (
+                set(Follow.objects.values_list('user', 'author')),
+                set(FeedItem.objects.values_list('user', 'post')),
+                set(UserStats.objects.values_list(
+                    'user', 'posts_count', 'followers_count',
+                    'following_count')),
+                Comment.objects.count())
+
+        before = snapshot()
+        call_command('bench_views', requests=2, warmup=1, format='json',
+                     stdout=StringIO())
+        self.assertEqual(snapshot(), before)
+
+    def test_feed_queries_do_not_depend_on_page_size(self):
+        """Число запросов лент не растёт с размером страницы"""
+        call_command('seed_bench', users=10, groups=2, posts=100,
+                     comments=400, follows=30, seed=1, stdout=StringIO())
+        out = StringIO()
+        call_command('bench_views', requests=2, warmup=0, format='json',
+                     cold_cache=True, per_page=[2, 20],
+                     route=['index', 'group_list', 'profile',
+                            'follow_index'],
+                     stdout=out)
+        queries = {}
+        for route in json.loads(out.getvalue())['routes']:
+            queries.setdefault(route['route'], []).append(
+                route['max_queries'])
+        self.assertEqual(len(queries), 4)
+        for route, counts in queries.items():
+            with self.subTest(route=route):
+                self.assertEqual(counts[0], counts[1])
@@ -0,0 +1,62 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+@override_settings(COMMENTS_PER_PAGE=10)
+class CommentPagesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Текст')
+        for num in range(25):
+            commenter = User.objects.create_user(username=f'user{num}')
+            Comment.objects.create(post=cls.post, author=commenter,
+                                   text=f'Комментарий {num}')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def texts(self, response):
+        return [comment.text for comment in response.context['comments']]
+
+    def test_post_shows_newest_comments(self):
+        """На странице поста только последние комментарии"""
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}))
+        self.assertEqual(self.texts(response),
+                         [f'Комментарий {num}' for num in range(24, 14, -1)])
+        self.assertContains(response, 'data-comments-fragment')
+
+    def test_fragment_continues_by_cursor(self):
+        """Фрагмент отдаёт следующие комментарии без разметки страницы"""
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.id})
+        texts, after = [], ''
+        while after is not None:
+            response = self.client.get(url, {'after': after})
+            self.assertNotContains(response, '<html')
+            texts += self.texts(response)
+            after = response.context['comments'].next_cursor
+        self.assertEqual(texts,
+                         [f'Комментарий {num}' for num in range(24, -1, -1)])
+
+    def test_queries_do_not_grow_with_comments(self):
+        """Комментарии и их авторы выбираются одним запросом"""
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.id})
+        # Сессия, пользователь и комментарии с авторами
+        with self.assertNumQueries(3):
+            self.client.get(url)
+
+    def test_fragment_is_hidden_from_guests(self):
+        """Гость, как и на странице поста, комментариев не видит"""
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.id})
+        response = Client().get(url, follow=True)
+        self.assertEqual(response.redirect_chain, [])
+        self.assertEqual(response.status_code, 403)
+        self.assertNotContains(response, 'Комментарий', status_code=403)
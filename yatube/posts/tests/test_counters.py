@@ -0,0 +1,93 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import QuerySet
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts import counters
+from posts.models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+
+    def test_posts_count_follows_create_and_delete(self):
+        """Счётчик постов автора меняется при создании и удалении"""
+        post = Post.objects.create(author=self.author, text='Пост')
+        Post.objects.create(author=self.author, text='Ещё пост')
+        self.assertEqual(self.author.stats.posts_count, 2)
+        post.delete()
+        self.author.stats.refresh_from_db()
+        self.assertEqual(self.author.stats.posts_count, 1)
+
+    def test_parallel_row_creation_keeps_increment(self):
+        """Прибавка не теряется при параллельном создании строки"""
+        user = User.objects.create_user(username='newcomer')
+        # Параллельный запрос создал строку после нашего UPDATE
+        UserStats.objects.create(user=user)
+        update = QuerySet.update
+        calls = []
+
+        def missed_first_update(queryset, **kwargs):
+            calls.append(kwargs)
+            return 0 if len(calls) == 1 else update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', missed_first_update):
+            counters.change_user_stats(user.id, posts_count=1)
+        self.assertEqual(UserStats.objects.get(user=user).posts_count, 1)
+
+    def test_follow_counters(self):
+        """Подписка меняет счётчики подписчиков и подписок"""
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).followers_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.user).following_count, 1)
+        follow.delete()
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).followers_count, 0)
+
+    def test_comments_count(self):
+        """Счётчик комментариев поста меняется вместе с комментариями"""
+        post = Post.objects.create(author=self.author, text='Пост')
+        comment = Comment.objects.create(post=post, author=self.user,
+                                         text='Комментарий')
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+    def test_profile_reads_counters(self):
+        """Профиль берёт количество постов из счётчика"""
+        Post.objects.create(author=self.author, text='Пост')
+        UserStats.objects.filter(user=self.author).update(posts_count=42)
+        response = self.guest_client.get(
+            reverse('posts:profile',
+                    kwargs={'username': self.author.username}))
+        self.assertEqual(response.context['posts_count'], 42)
+
+    def test_reconcile_counters_repairs_drift(self):
+        """Команда reconcile_counters исправляет расхождения"""
+        post = Post.objects.create(author=self.author, text='Пост')
+        Comment.objects.create(post=post, author=self.user, text='Текст')
+        UserStats.objects.filter(user=self.author).update(posts_count=42)
+        Post.objects.filter(pk=post.pk).update(comments_count=7)
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 1)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
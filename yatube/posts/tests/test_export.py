@@ -0,0 +1,95 @@
+import csv
+import json
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.staff = User.objects.create_user(username='staff',
+                                             is_staff=True,
+                                             is_superuser=True)
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.post = Post.objects.create(author=cls.author, group=cls.group,
+                                       text='Пост, с "кавычками"')
+        cls.old_post = Post.objects.create(author=cls.author, text='Старый')
+        Post.objects.filter(pk=cls.old_post.pk).update(
+            pub_date=timezone.now() - timedelta(days=10))
+        Post.objects.create(author=cls.other, text='Чужой')
+        Comment.objects.create(post=cls.post, author=cls.other,
+                               text='Комментарий')
+        Follow.objects.create(user=cls.other, author=cls.author)
+
+    def export(self, *args, **options):
+        out = StringIO()
+        call_command('export_data', *args, stdout=out, **options)
+        return out.getvalue()
+
+    def test_ndjson_filtered_by_author_and_date(self):
+        """Посты выгружаются построчно с отбором по автору и датам"""
+        since = (timezone.localdate() - timedelta(days=1)).isoformat()
+        output = self.export('posts', author='author', since=since,
+                             chunk_size=1)
+        rows = [json.loads(line) for line in output.splitlines()]
+        self.assertEqual([row['id'] for row in rows], [self.post.id])
+        self.assertEqual(rows[0]['author'], 'author')
+        self.assertEqual(rows[0]['group'], 'group')
+        self.assertEqual(rows[0]['text'], self.post.text)
+
+    def test_csv(self):
+        """Комментарии и подписки выгружаются в CSV с заголовком"""
+        rows = list(csv.reader(StringIO(
+            self.export('comments', format='csv', group='group'))))
+        self.assertEqual(rows, [
+            ['id', 'post', 'author', 'created', 'text'],
+            [str(self.post.comments.get().id), str(self.post.id), 'other',
+             rows[1][3], 'Комментарий']])
+        rows = list(csv.reader(StringIO(
+            self.export('follows', format='csv'))))
+        self.assertEqual(rows[1][1:], ['other', 'author'])
+
+    def test_unsupported_filter(self):
+        """Неподходящий отбор выгрузки — ошибка команды"""
+        with self.assertRaises(CommandError):
+            self.export('follows', group='group')
+        with self.assertRaises(CommandError):
+            self.export('posts', since='вчера')
+
+    def test_staff_endpoint_streams(self):
+        """Выгрузка по адресу доступна только персоналу и идёт потоком"""
+        url = reverse('api:export', kwargs={'kind': 'posts'})
+        client = Client()
+        client.force_login(self.other)
+        self.assertEqual(client.get(url).status_code, 403)
+        client.force_login(self.staff)
+        response = client.get(url, {'format': 'csv', 'author': 'other'})
+        self.assertTrue(response.streaming)
+        self.assertIn('posts.csv', response['Content-Disposition'])
+        content = b''.join(response.streaming_content).decode()
+        self.assertEqual(len(content.splitlines()), 2)
+        self.assertEqual(client.get(url, {'format': 'xml'}).status_code,
+                         400)
+
+    def test_admin_action(self):
+        """Действие админки выгружает выбранные посты"""
+        client = Client()
+        client.force_login(self.staff)
+        response = client.post(reverse('admin:posts_post_changelist'), {
+            'action': 'export_ndjson',
+            '_selected_action': [self.post.id, self.old_post.id]})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines],
+                         [self.post.id, self.old_post.id])
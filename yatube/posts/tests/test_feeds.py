@@ -0,0 +1,143 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts import counts
+from posts.models import FeedItem, Follow, Post
+
+User = get_user_model()
+
+
+class FollowFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+
+    def setUp(self):
+        self.user_client = Client()
+        self.user_client.force_login(self.user)
+        cache.clear()
+
+    def test_new_post_is_pushed_to_followers(self):
+        """Новый пост попадает в ленты подписчиков автора"""
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        Post.objects.create(author=self.other, text='Чужой пост')
+        self.assertEqual(
+            list(FeedItem.objects.filter(user=self.user)
+                 .values_list('post_id', flat=True)),
+            [post.id])
+
+    def test_follow_backfills_and_unfollow_trims(self):
+        """Подписка дополняет ленту, отписка очищает её"""
+        Post.objects.create(author=self.author, text='Старый пост')
+        self.user_client.get(reverse('posts:profile_follow',
+                                     kwargs={'username':
+                                             self.author.username}))
+        self.assertEqual(FeedItem.objects.filter(user=self.user).count(), 1)
+        self.user_client.get(reverse('posts:profile_unfollow',
+                                     kwargs={'username':
+                                             self.author.username}))
+        self.assertFalse(FeedItem.objects.filter(user=self.user).exists())
+
+    def test_follow_index_reads_feed(self):
+        """Страница подписок строится по материализованной ленте"""
+        Follow.objects.create(user=self.user, author=self.author)
+        posts = [Post.objects.create(author=self.author, text=f'Пост {num}')
+                 for num in range(3)]
+        response = self.user_client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']),
+                         posts[::-1])
+
+    def test_rebuild_feeds_command(self):
+        """Команда rebuild_feeds восстанавливает ленты"""
+        Follow.objects.create(user=self.user, author=self.author)
+        Post.objects.create(author=self.author, text='Пост')
+        FeedItem.objects.all().delete()
+        call_command('rebuild_feeds', stdout=StringIO())
+        self.assertEqual(FeedItem.objects.filter(user=self.user).count(), 1)
+
+    def test_follow_index_cursor(self):
+        """Лента подписок листается по курсору"""
+        Follow.objects.create(user=self.user, author=self.author)
+        posts = [Post.objects.create(author=self.author, text=f'Пост {num}')
+                 for num in range(15)]
+        url = reverse('posts:follow_index')
+        first = self.user_client.get(url, {'after': 'x'}).context['page_obj']
+        second = self.user_client.get(
+            url, {'after': first.next_cursor}).context['page_obj']
+        self.assertEqual(list(first) + list(second), posts[::-1])
+        self.assertFalse(second.has_next())
+
+
+@override_settings(FEED_PULL_FOLLOWER_THRESHOLD=1)
+class HybridFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.fan = User.objects.create_user(username='fan')
+        cls.author = User.objects.create_user(username='author')
+        cls.star = User.objects.create_user(username='star')
+        Follow.objects.create(user=cls.user, author=cls.author)
+        Follow.objects.create(user=cls.user, author=cls.star)
+        Follow.objects.create(user=cls.fan, author=cls.star)
+
+    def setUp(self):
+        self.user_client = Client()
+        self.user_client.force_login(self.user)
+        cache.clear()
+
+    def test_star_posts_are_not_pushed(self):
+        """Посты автора с большим числом подписчиков не пишутся в ленты"""
+        Post.objects.create(author=self.star, text='Пост звезды')
+        self.assertFalse(FeedItem.objects.filter(author=self.star).exists())
+
+    def test_feed_merges_pushed_and_pulled_posts(self):
+        """Лента сливает разложенные и выбранные при чтении посты"""
+        posts = []
+        for num in range(12):
+            author = self.star if num % 3 else self.author
+            posts.append(Post.objects.create(author=author,
+                                             text=f'Пост {num}'))
+        url = reverse('posts:follow_index')
+        first = self.user_client.get(url).context['page_obj']
+        second = self.user_client.get(
+            url, {'after': first.next_cursor}).context['page_obj']
+        self.assertEqual(list(first) + list(second), posts[::-1])
+        self.assertFalse(second.has_next())
+
+    def test_star_posts_keep_follower_counts(self):
+        """Счётчики лент сбрасывают только посты, записанные в ленты"""
+        key = counts.follow_posts_key(self.user.id)
+        cache.set(key, 5)
+        Post.objects.create(author=self.star, text='Пост звезды')
+        self.assertEqual(cache.get(key), 5)
+        Post.objects.create(author=self.author, text='Пост автора')
+        self.assertIsNone(cache.get(key))
+
+    def test_deleted_post_resets_feed_counts(self):
+        """Удаление поста сбрасывает счётчики лент, где он был"""
+        post = Post.objects.create(author=self.author, text='Пост')
+        key = counts.follow_posts_key(self.user.id)
+        cache.set(key, 1)
+        post.delete()
+        self.assertIsNone(cache.get(key))
+
+    def test_author_below_threshold_is_backfilled(self):
+        """Посты автора, ставшего обычным, попадают в ленты подписчиков"""
+        post = Post.objects.create(author=self.star, text='Пост звезды')
+        key = counts.follow_posts_key(self.user.id)
+        cache.set(key, 0)
+        Follow.objects.filter(user=self.fan, author=self.star).delete()
+        self.assertTrue(FeedItem.objects.filter(user=self.user,
+                                                post=post).exists())
+        self.assertIsNone(cache.get(key))
+        response = self.user_client.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'])
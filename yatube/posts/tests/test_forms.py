@@ -1,3 +1,4 @@
+import hashlib
 import shutil
 import tempfile
 
@@ -91,6 +92,8 @@ class PostFormTests(TestCase):
                                 data=form_data,
                                 follow=True)
         self.assertEqual(posts_count_before + 1, Post.objects.count())
-        self.assertTrue(Post.objects.filter(text=form_data['text'],
-                                            group=form_data['group'],
-                                            image='posts/small.jpg').exists())
+        digest = hashlib.sha256(small_img).hexdigest()
+        self.assertTrue(Post.objects.filter(
+            text=form_data['text'],
+            group=form_data['group'],
+            image=f'posts/{digest[:2]}/{digest}.jpg').exists())
@@ -0,0 +1,96 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts import images, thumbnails
+from posts.models import Post
+from posts.tests.test_thumbnails import image_file
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+User = get_user_model()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_THUMBNAIL_WORKERS=0)
+class ImageMetadataTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_upload_fills_metadata(self):
+        """Размеры картинки сохраняются при загрузке и сбрасываются"""
+        upload = image_file()
+        post = Post.objects.create(author=self.author, text='Текст',
+                                   image=upload)
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (40, 20))
+        self.assertEqual(post.image_size, upload.size)
+        post.image = None
+        post.save()
+        post.refresh_from_db()
+        self.assertIsNone(post.image_width)
+        self.assertIsNone(post.image_size)
+
+    def test_command_fills_missing_metadata(self):
+        """fill_image_metadata заполняет размеры старых картинок"""
+        post = Post.objects.create(author=self.author, text='Текст',
+                                   image=image_file())
+        Post.objects.create(author=self.author, text='Копия',
+                            image=post.image.name)
+        Post.objects.create(author=self.author, text='Без файла',
+                            image='posts/missing.png')
+        Post.objects.update(image_width=None, image_height=None,
+                            image_size=None)
+        out = StringIO()
+        call_command('fill_image_metadata', batch_size=1, stdout=out)
+        self.assertIn('у 2 постов', out.getvalue())
+        self.assertEqual(
+            Post.objects.filter(image_width=40, image_height=20).count(), 2)
+
+    def test_command_reads_shared_image_once(self):
+        """Общая картинка пакета читается и обновляется один раз"""
+        post = Post.objects.create(author=self.author, text='Текст',
+                                   image=image_file())
+        for num in range(3):
+            Post.objects.create(author=self.author, text=f'Копия {num}',
+                                image=post.image.name)
+        Post.objects.update(image_width=None, image_height=None,
+                            image_size=None)
+        with mock.patch.object(images, 'metadata',
+                               wraps=images.metadata) as metadata:
+            # Выборка пакета, обновление, пустой пакет
+            with self.assertNumQueries(3):
+                call_command('fill_image_metadata', stdout=StringIO())
+        self.assertEqual(metadata.call_count, 1)
+        self.assertFalse(Post.objects.filter(image_width=None).exists())
+
+    def test_templates_render_sizes_without_files(self):
+        """<img> выводится с размерами и ленивой загрузкой"""
+        post = Post.objects.create(author=self.author, text='Текст',
+                                   image=image_file())
+        thumbnails.generate(post.image.name)
+        shutil.rmtree(TEMP_MEDIA_ROOT)
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(response, 'width="960" height="339" '
+                                      'loading="lazy"')
+        author_client = Client()
+        author_client.force_login(self.author)
+        response = author_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.id}))
+        self.assertContains(response, 'Оригинал: 40×20')
+        self.assertNotContains(response, 'loading="lazy"')
@@ -0,0 +1,170 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from posts import counts, page_cache
+from posts.models import (Comment, FeedItem, Follow, Group, ImageBlob,
+                          Post)
+from posts.tests.test_thumbnails import image_file
+
+TEMP_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+TEMP_MEDIA_ROOT = os.path.join(TEMP_DIR, 'media')
+User = get_user_model()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def write(self, name, content):
+        path = os.path.join(TEMP_DIR, name)
+        with open(path, 'w') as file:
+            file.write(content)
+        return path
+
+    def load(self, *args, **options):
+        out, err = StringIO(), StringIO()
+        call_command('import_data', *args, stdout=out, stderr=err,
+                     **options)
+        return out.getvalue(), err.getvalue()
+
+    def test_export_roundtrip(self):
+        """Выгрузка export_data загружается обратно с теми же полями"""
+        post = Post.objects.create(author=self.author, group=self.group,
+                                   text='Пост')
+        Comment.objects.create(post=post, author=self.author, text='Ответ')
+        posts_path = os.path.join(TEMP_DIR, 'posts.ndjson')
+        comments_path = os.path.join(TEMP_DIR, 'comments.csv')
+        call_command('export_data', 'posts', output=posts_path,
+                     stdout=StringIO())
+        call_command('export_data', 'comments', format='csv',
+                     output=comments_path, stdout=StringIO())
+        Post.objects.all().delete()
+        out, _ = self.load('posts', posts_path)
+        self.assertIn('Загружено: 1, ошибок: 0', out)
+        self.load('comments', comments_path)
+        restored = Post.objects.get()
+        self.assertEqual(
+            (restored.pk, restored.text, restored.group, restored.pub_date),
+            (post.pk, post.text, self.group, post.pub_date))
+        self.assertEqual(restored.comments_count, 1)
+        self.assertEqual(restored.author.stats.posts_count, 1)
+
+    def test_invalid_rows_are_reported(self):
+        """Ошибочные строки пропускаются, остальные загружаются"""
+        path = self.write('posts.csv', '\n'.join((
+            'author,group,text',
+            'author,group,Первый',
+            'nobody,,Без автора',
+            'author,missing,Без группы',
+            'author,,',
+            'author,,Второй')))
+        out, err = self.load('posts', path, batch_size=2)
+        self.assertIn('Загружено: 2, ошибок: 3', out)
+        self.assertIn('Строка 2', err)
+        self.assertEqual(sorted(Post.objects.values_list('text', flat=True)),
+                         ['Второй', 'Первый'])
+
+    def test_resume_from_checkpoint(self):
+        """После сбоя загрузка продолжается с сохранённой строки"""
+        path = self.write('posts.ndjson', '\n'.join(
+            json.dumps({'author': 'author', 'text': f'Пост {num}'})
+            for num in range(1, 6)))
+        checkpoint = self.write('checkpoint', '3')
+        self.load('posts', path, checkpoint=checkpoint, batch_size=1)
+        self.assertEqual(sorted(Post.objects.values_list('text', flat=True)),
+                         ['Пост 4', 'Пост 5'])
+        with open(checkpoint) as file:
+            self.assertEqual(file.read(), '5')
+
+    def test_only_touched_data_is_reset(self):
+        """Загрузка пересчитывает ленты и кэш только затронутых авторов"""
+        reader = User.objects.create_user(username='reader')
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=reader, author=self.author)
+        cache.set(counts.author_posts_key(other.id), 7)
+        cache.set(counts.author_posts_key(self.author.id), 7)
+        scopes = (page_cache.author_scope(other.id),
+                  page_cache.author_scope(self.author.id),
+                  page_cache.group_scope(self.group.id))
+        before = page_cache._get_versions(scopes)
+        path = self.write('touched.ndjson', json.dumps(
+            {'author': 'author', 'group': 'group', 'text': 'Пост'}))
+        self.load('posts', path)
+        after = page_cache._get_versions(scopes)
+        self.assertEqual(cache.get(counts.author_posts_key(other.id)), 7)
+        self.assertIsNone(cache.get(counts.author_posts_key(self.author.id)))
+        self.assertEqual(after[scopes[0]], before[scopes[0]])
+        self.assertNotEqual(after[scopes[1]], before[scopes[1]])
+        self.assertNotEqual(after[scopes[2]], before[scopes[2]])
+        self.assertTrue(FeedItem.objects.filter(user=reader).exists())
+        self.assertEqual(User.objects.get(pk=self.author.pk)
+                         .stats.posts_count, 1)
+
+    def test_resume_recounts_loaded_rows(self):
+        """После продолжения пересчитываются и загруженные до сбоя посты"""
+        first, second = (Post.objects.create(author=self.author,
+                                             text=f'Пост {num}')
+                         for num in range(2))
+        path = self.write('comments.ndjson', '\n'.join(
+            json.dumps({'author': 'author', 'post': post.pk,
+                        'text': 'Ответ'})
+            for post in (first, second)))
+        checkpoint = self.write('checkpoint', '1')
+        # Первая строка загружена до сбоя, счётчик не пересчитан
+        Comment.objects.bulk_create([
+            Comment(post=first, author=self.author, text='Ответ')])
+        self.load('comments', path, checkpoint=checkpoint)
+        comments_count = dict(Post.objects.values_list('pk', 'comments_count'))
+        self.assertEqual(comments_count, {first.pk: 1, second.pk: 1})
+
+    def test_images_are_copied(self):
+        """Картинки из --images-dir копируются в хранилище постов"""
+        images_dir = os.path.join(TEMP_DIR, 'images')
+        os.makedirs(images_dir, exist_ok=True)
+        with open(os.path.join(images_dir, 'photo.png'), 'wb') as file:
+            file.write(image_file().read())
+        path = self.write('images.ndjson', '\n'.join(
+            json.dumps({'author': 'author', 'text': 'С картинкой',
+                        'image': 'photo.png'})
+            for _ in range(2)))
+        self.load('posts', path, images_dir=images_dir)
+        first, second = Post.objects.all()
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(os.path.exists(first.image.path))
+        self.assertEqual((first.image_width, first.image_height), (40, 20))
+        self.assertEqual(ImageBlob.objects.get().references, 2)
+
+    def test_failed_batch_releases_copied_images(self):
+        """Картинки несохранённой пачки достаются prune_images"""
+        images_dir = os.path.join(TEMP_DIR, 'images')
+        os.makedirs(images_dir, exist_ok=True)
+        with open(os.path.join(images_dir, 'photo.png'), 'wb') as file:
+            file.write(image_file().read())
+        path = self.write('duplicates.ndjson', '\n'.join(
+            json.dumps({'id': 1, 'author': 'author', 'text': 'Дубль',
+                        'image': 'photo.png'})
+            for _ in range(2)))
+        with self.assertRaises(CommandError):
+            self.load('posts', path, images_dir=images_dir)
+        self.assertFalse(Post.objects.exists())
+        blob = ImageBlob.objects.get()
+        self.assertEqual(blob.references, 0)
+        self.assertIsNotNone(blob.released)
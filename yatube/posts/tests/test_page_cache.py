@@ -0,0 +1,163 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts import page_cache
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class PageCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.post = Post.objects.create(author=cls.author, group=cls.group,
+                                       text='Текст поста')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def urls(self):
+        return (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': self.author.username}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        )
+
+    def test_cached_pages_need_no_queries(self):
+        """Повторный запрос гостя отдаётся из кэша без обращений к БД"""
+        for url in self.urls():
+            with self.subTest(url=url):
+                first = self.guest_client.get(url)
+                with self.assertNumQueries(0):
+                    second = self.guest_client.get(url)
+                self.assertEqual(first.content, second.content)
+
+    def test_signals_invalidate_dependent_pages(self):
+        """Изменения данных сразу видны на зависящих от них страницах"""
+        group_url, profile_url, detail_url = self.urls()[1:]
+        changes = (
+            (detail_url, lambda: Comment.objects.create(
+                post=self.post, author=self.reader, text='Комментарий'),
+             'Комментарий'),
+            (profile_url, lambda: Follow.objects.create(
+                user=self.reader, author=self.author),
+             'Подписчиков: 1'),
+            (group_url, self.rename_group, 'Новое название'),
+        )
+        for url, change, expected in changes:
+            with self.subTest(url=url):
+                before = self.reader_client.get(url).content.decode()
+                change()
+                after = self.reader_client.get(url).content.decode()
+                self.assertNotIn(expected, before)
+                self.assertIn(expected, after)
+
+    def rename_group(self):
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Новое название'
+        group.save()
+
+    def test_post_edit_resets_index(self):
+        """Правка поста сбрасывает главную страницу"""
+        url = reverse('posts:index')
+        self.guest_client.get(url)
+        self.post.text = 'Новый текст'
+        self.post.save()
+        self.assertContains(self.guest_client.get(url), 'Новый текст')
+
+    def test_users_get_own_copy(self):
+        """Гость и пользователь получают разные копии страницы"""
+        url = reverse('posts:index')
+        self.guest_client.get(url)
+        response = self.reader_client.get(url)
+        self.assertContains(response, 'reader')
+        self.assertNotContains(self.guest_client.get(url), 'reader')
+
+    def test_unchanged_pages_not_modified(self):
+        """Неизменённая страница отдаётся с 304 без отрисовки"""
+        for url in self.urls():
+            with self.subTest(url=url):
+                # Первый ответ ставит CSRF-cookie, от которого зависит ключ
+                self.reader_client.get(url)
+                response = self.reader_client.get(url)
+                self.assertIn('private', response['Cache-Control'])
+                # Остаются только запросы сессии и пользователя
+                with self.assertNumQueries(2):
+                    not_modified = self.reader_client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(not_modified.status_code, 304)
+                self.assertEqual(not_modified.content, b'')
+                since = self.reader_client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+                self.assertEqual(since.status_code, 304)
+
+    def test_changed_page_gets_new_etag(self):
+        """После изменения данных страница отдаётся целиком с новым ETag"""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        etag = self.guest_client.get(url)['ETag']
+        self.assertNotEqual(self.reader_client.get(url)['ETag'], etag)
+        self.post.text = 'Новый текст'
+        self.post.save()
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Новый текст')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_comment_resets_only_its_post(self):
+        """Комментарий обновляет карточку в лентах, не сбрасывая их все"""
+        url = reverse('posts:index')
+        self.guest_client.get(url)
+        versions = page_cache._get_versions([page_cache.ALL_POSTS_SCOPE])
+        Comment.objects.create(post=self.post, author=self.reader,
+                               text='Новый комментарий')
+        self.assertContains(self.guest_client.get(url), 'Новый комментарий')
+        self.assertEqual(
+            page_cache._get_versions([page_cache.ALL_POSTS_SCOPE]), versions)
+
+    def test_registration_keeps_pages(self):
+        """Регистрация и вход не сбрасывают страницы"""
+        url = reverse('posts:index')
+        self.guest_client.get(url)
+        user = User.objects.create_user(username='newcomer')
+        self.client.force_login(user)
+        with self.assertNumQueries(0):
+            self.guest_client.get(url)
+
+    def test_rename_resets_pages(self):
+        """Смена имени автора видна на страницах с его постами"""
+        url = reverse('posts:index')
+        self.guest_client.get(url)
+        author = User.objects.get(pk=self.author.pk)
+        author.username = 'renamed'
+        author.save()
+        self.assertContains(self.guest_client.get(url), 'renamed')
+
+    def test_page_changed_during_render_is_not_cached(self):
+        """Страница, чей пост изменился во время отрисовки, не кэшируется"""
+        depends_on_posts = page_cache.depends_on_posts
+
+        def comment_meanwhile(request, posts):
+            page_cache.bump(page_cache.post_scope(self.post.id))
+            depends_on_posts(request, posts)
+
+        url = reverse('posts:index')
+        with mock.patch.object(page_cache, 'depends_on_posts',
+                               comment_meanwhile):
+            self.guest_client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.guest_client.get(url)
+        self.assertTrue(queries.captured_queries)
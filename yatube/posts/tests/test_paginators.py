@@ -0,0 +1,152 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts import counts
+from posts.models import Group, Post
+from posts.paginators import CursorPaginator, FeedPaginator
+from posts.templatetags.pagination import elided_page_range
+
+User = get_user_model()
+
+
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание'
+        )
+        Post.objects.bulk_create(
+            Post(text=f'Пост № {num}', author=cls.author, group=cls.group)
+            for num in range(25)
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+
+    def test_pages_cover_all_posts_once(self):
+        """Проход по курсорам возвращает все посты без повторов"""
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        page = paginator.page_after()
+        seen = list(page)
+        while page.has_next():
+            page = paginator.page_after(page.next_cursor)
+            seen.extend(page)
+        self.assertEqual(seen, list(Post.objects.order_by('-pub_date',
+                                                          '-id')))
+
+    def test_before_returns_previous_page(self):
+        """Курсор ?before= возвращает предыдущую страницу"""
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        first = paginator.page_after()
+        second = paginator.page_after(first.next_cursor)
+        back = paginator.page_before(second.previous_cursor)
+        self.assertEqual(list(back), list(first))
+        self.assertFalse(back.has_previous())
+
+    def test_page_uses_single_query(self):
+        """Страница по курсору строится одним запросом без COUNT"""
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        cursor = paginator.page_after().next_cursor
+        with self.assertNumQueries(1):
+            list(paginator.page_after(cursor))
+
+    def test_broken_cursor_returns_first_page(self):
+        """Повреждённый курсор отдаёт первую страницу"""
+        response = self.guest_client.get(
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            {'after': 'not-a-cursor'})
+        page_obj = response.context['page_obj']
+        self.assertEqual(len(page_obj), 10)
+        self.assertFalse(page_obj.has_previous())
+
+    def test_feeds_accept_cursor(self):
+        """Ленты принимают параметр ?after="""
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        cursor = paginator.page_after().next_cursor
+        urls = (reverse('posts:index'),
+                reverse('posts:group_list',
+                        kwargs={'slug': self.group.slug}),
+                reverse('posts:profile',
+                        kwargs={'username': self.author.username}))
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url, {'after': cursor})
+                page_obj = response.context['page_obj']
+                self.assertEqual(len(page_obj), 10)
+                self.assertContains(response, '?before=')
+
+
+class FeedPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        Post.objects.bulk_create(
+            Post(text=f'Пост № {num}', author=cls.author)
+            for num in range(100)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_page_range_is_elided(self):
+        """Навигация выводит только соседние и крайние страницы"""
+        paginator = FeedPaginator(Post.objects.all(), 2)
+        page = paginator.get_page(25)
+        page_range = list(elided_page_range(page))
+        self.assertEqual(page_range, [1, paginator.ELLIPSIS,
+                                      23, 24, 25, 26, 27,
+                                      paginator.ELLIPSIS, 50])
+
+    def test_count_is_cached(self):
+        """Количество постов берётся из кэша"""
+        key = counts.author_posts_key(self.author.id)
+        queryset = self.author.posts.all()
+        FeedPaginator(queryset, 10, count_key=key).count
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                FeedPaginator(queryset, 10, count_key=key).count, 100)
+
+    def test_count_is_invalidated_on_create_and_delete(self):
+        """Создание и удаление поста сбрасывают кэш количества"""
+        key = counts.author_posts_key(self.author.id)
+        queryset = self.author.posts.all()
+        counts.cached_count(key, queryset)
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertEqual(counts.cached_count(key, queryset), 101)
+        post.delete()
+        self.assertEqual(counts.cached_count(key, queryset), 100)
+
+    def test_links_keep_query_string(self):
+        """Ссылки навигации сохраняют остальные параметры запроса"""
+        url = reverse('posts:index')
+        response = Client().get(url, {'page': 2, 'lang': 'ru'})
+        self.assertContains(response, 'href="?lang=ru&amp;page=3"')
+        cursor = response.context['page_obj'][0]
+        paginator = CursorPaginator(Post.objects.all(), 2)
+        response = Client().get(url, {'after': paginator.encode_cursor(cursor),
+                                      'lang': 'ru'})
+        self.assertContains(response, 'href="?lang=ru&amp;after=')
+        self.assertContains(response, 'href="?lang=ru&amp;before=')
+
+    def test_deep_page_links_into_cursor_mode(self):
+        """С глубоких страниц «Следующая» ведёт в вывод по курсору"""
+        url = reverse('posts:index')
+        response = Client().get(url, {'page': 2})
+        self.assertIsNone(getattr(response.context['page_obj'],
+                                  'next_cursor', None))
+        page = settings.POST_CURSOR_FROM_PAGE
+        response = Client().get(url, {'page': page})
+        page_obj = response.context['page_obj']
+        self.assertContains(
+            response, f'href="?after={page_obj.next_cursor}"')
+        response = Client().get(url, {'after': page_obj.next_cursor})
+        self.assertEqual(response.context['page_obj'][0].text,
+                         Post.objects.all()[page * 10].text)
@@ -0,0 +1,115 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.models import Comment, Group, Post
+from posts.views import add_comment_previews
+
+User = get_user_model()
+
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+
+
+class PostCardsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.post = Post.objects.create(author=cls.author, group=cls.group,
+                                       text='Текст поста')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_card_is_shared_between_feeds(self):
+        """Карточка, отрисованная для главной, берётся из кэша в группе"""
+        response = self.client.get(reverse('posts:index'))
+        self.assertTemplateUsed(response, CARD_TEMPLATE)
+        response = self.client.get(
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}))
+        self.assertTemplateNotUsed(response, CARD_TEMPLATE)
+        self.assertContains(response, 'Текст поста')
+
+    def test_profile_uses_own_variant(self):
+        """В профиле карточка без автора отрисовывается отдельно"""
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': 'author'}))
+        self.assertTemplateUsed(response, CARD_TEMPLATE)
+
+    def test_edit_renders_new_card(self):
+        """Правка поста меняет версию карточки"""
+        self.client.get(reverse('posts:index'))
+        self.post.text = 'Новый текст'
+        self.post.save()
+        response = self.client.get(
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}))
+        self.assertTemplateUsed(response, CARD_TEMPLATE)
+        self.assertContains(response, 'Новый текст')
+        self.assertNotContains(response, 'Текст поста')
+
+    def test_card_shows_latest_comments(self):
+        """В карточке счётчик и два последних комментария"""
+        for num in range(3):
+            Comment.objects.create(post=self.post, author=self.author,
+                                   text=f'Комментарий {num}')
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Комментариев: 3')
+        self.assertContains(response, 'Комментарий 2')
+        self.assertContains(response, 'Комментарий 1')
+        self.assertNotContains(response, 'Комментарий 0')
+
+    def test_new_comment_refreshes_feed(self):
+        """Новый комментарий сбрасывает кэш страниц лент с постом"""
+        self.client.get(reverse('posts:index'))
+        Comment.objects.create(post=self.post, author=self.author,
+                               text='Свежий комментарий')
+        for url in (reverse('posts:index'),
+                    reverse('posts:group_list',
+                            kwargs={'slug': self.group.slug}),
+                    reverse('posts:profile', kwargs={'username': 'author'})):
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url),
+                                    'Свежий комментарий')
+
+    def test_previews_are_one_query_per_page(self):
+        """Комментарии всех постов страницы выбираются одним запросом"""
+        posts = [Post.objects.create(author=self.author, text=f'Пост {num}')
+                 for num in range(6)]
+        for post in posts:
+            for num in range(3):
+                Comment.objects.create(post=post, author=self.author,
+                                       text=f'Комментарий {num}')
+        for per_page in (2, 6):
+            with self.subTest(per_page=per_page):
+                with override_settings(POST_PER_PAGE=per_page):
+                    cache.clear()
+                    with self.assertNumQueries(3):
+                        response = self.client.get(reverse('posts:index'))
+                page = response.context['page_obj']
+                self.assertEqual(len(page), per_page)
+                for post in page:
+                    self.assertEqual(
+                        [comment.text for comment in post.latest_comments],
+                        ['Комментарий 2', 'Комментарий 1'])
+
+    def test_previews_do_not_scan_all_comments(self):
+        """Комментарии карточек выбираются по индексу для каждого поста"""
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.author, text='Комментарий')
+            for _ in range(50))
+        page = Paginator(Post.objects.all(), 10).page(1)
+        with CaptureQueriesContext(connection) as queries:
+            add_comment_previews(page)
+        self.assertEqual(len(page[0].latest_comments), 2)
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN '
+                           + queries.captured_queries[-1]['sql'])
+            plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+        self.assertNotIn('CORRELATED', plan)
+        self.assertIn('comment_post_recent_idx', plan)
@@ -0,0 +1,77 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from core.query_budget import QueryBudgetExceeded, check_budget, \
+    get_budget, record_queries
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.authors = [User.objects.create_user(username=f'author{num}')
+                       for num in range(3)]
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание'
+        )
+        for author in cls.authors:
+            Follow.objects.create(user=cls.user, author=author)
+        for num in range(15):
+            cls.post = Post.objects.create(author=cls.authors[num % 3],
+                                           group=cls.group,
+                                           text=f'Пост {num}')
+            for commenter in cls.authors:
+                Comment.objects.create(post=cls.post, author=commenter,
+                                       text='Комментарий')
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.user_client = Client()
+        self.user_client.force_login(self.user)
+        cache.clear()
+
+    def test_views_stay_within_budget(self):
+        """Представления укладываются в бюджет запросов и не делают N+1"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': self.authors[0].username}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            reverse('posts:follow_index'),
+            reverse('posts:post_create'),
+        )
+        for url in urls:
+            for client in (self.guest_client, self.user_client):
+                with self.subTest(url=url):
+                    cache.clear()
+                    client.get(url)
+
+    def test_repeated_queries_are_detected(self):
+        """Повторяющиеся запросы одной формы считаются N+1"""
+        with record_queries() as recorder:
+            for post in Post.objects.all()[:5]:
+                post.author.username
+        with self.assertRaises(QueryBudgetExceeded):
+            check_budget('posts:index', recorder)
+
+    def test_budget_depends_on_method(self):
+        """Для POST берётся отдельный бюджет, если он задан"""
+        budgets = {'posts:post_create': 4, 'POST posts:post_create': 21}
+        with self.settings(QUERY_BUDGETS=budgets):
+            self.assertEqual(get_budget('posts:post_create'), 4)
+            self.assertEqual(get_budget('posts:post_create', 'POST'), 21)
+            self.assertEqual(get_budget('posts:post_edit', 'POST'),
+                             settings.QUERY_BUDGET_DEFAULT)
+
+    def test_suite_runs_in_strict_mode(self):
+        """Тестовый раннер включает строгий режим для всех тестов"""
+        self.assertTrue(settings.QUERY_BUDGET_STRICT)
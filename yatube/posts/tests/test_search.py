@@ -0,0 +1,90 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.models import Post
+from posts.search import SearchPaginator
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.best = Post.objects.create(
+            author=cls.author, text='Котики, котики и снова котики')
+        cls.other = Post.objects.create(
+            author=cls.author, text='Один котик <b>среди</b> собак и птиц')
+        Post.objects.create(author=cls.author, text='Только собаки')
+
+    def search(self, query, **params):
+        response = Client().get(reverse('posts:search'),
+                                dict(params, q=query))
+        return response.context['page_obj']
+
+    def test_ranked_results_with_snippets(self):
+        """Поиск находит посты по префиксу слова, лучшие — первыми"""
+        page = self.search('кот')
+        self.assertEqual(list(page), [self.best, self.other])
+        self.assertIn('<mark>котик</mark>', page[1].search_snippet)
+        self.assertIn('&lt;b&gt;', page[1].search_snippet)
+
+    def test_index_follows_changes(self):
+        """Индекс обновляется при правке, массовом обновлении и удалении"""
+        self.other.text = 'Теперь про хомяков'
+        self.other.save()
+        self.assertEqual(list(self.search('хомяк')), [self.other])
+        Post.objects.filter(pk=self.best.pk).update(text='Хомяки')
+        self.assertEqual(list(self.search('кот')), [])
+        Post.objects.bulk_create([Post(author=self.author, text='Кот')])
+        self.best.delete()
+        self.assertEqual([post.text for post in self.search('кот хомяк')],
+                         [])
+        self.assertEqual(len(self.search('хомяк')), 1)
+
+    def test_cursor_paging(self):
+        """Результаты листаются по курсору без повторов"""
+        Post.objects.bulk_create(
+            [Post(author=self.author, text=f'котик номер {num}')
+             for num in range(15)])
+        first = self.search('котик')
+        second = self.search('котик', after=first.next_cursor)
+        ids = [post.id for post in first] + [post.id for post in second]
+        self.assertEqual(len(ids), 17)
+        self.assertEqual(len(set(ids)), 17)
+        self.assertIsNone(second.next_cursor)
+        back = self.search('котик', before=second.previous_cursor)
+        self.assertEqual(list(back), list(first))
+
+    def test_cursor_links_keep_query(self):
+        """Ссылки на страницы строит общий шаблон и сохраняет запрос"""
+        Post.objects.bulk_create(
+            [Post(author=self.author, text=f'котик номер {num}')
+             for num in range(15)])
+        response = Client().get(reverse('posts:search'), {'q': 'котик'})
+        self.assertTemplateUsed(response, 'posts/includes/paginator.html')
+        cursor = response.context['page_obj'].next_cursor
+        self.assertContains(
+            response, f'href="?q=%D0%BA%D0%BE%D1%82%D0%B8%D0%BA&amp;'
+                      f'after={cursor}"')
+
+    def test_key_filter_is_a_condition(self):
+        """_key_filter поиска, как и у базового пагинатора, возвращает Q"""
+        paginator = SearchPaginator('котик', 10)
+        self.assertIsInstance(paginator._key_filter([1.5, 3], 'lt'), Q)
+
+    def test_operators_are_not_parsed(self):
+        """Спецсимволы FTS5 в запросе не приводят к ошибке"""
+        self.assertEqual(len(self.search('"кот* -(')), 2)
+        self.assertEqual(len(self.search('')), 0)
+
+    def test_admin_uses_index(self):
+        """Поиск в админке идёт по индексу"""
+        admin = User.objects.create_superuser(username='admin')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(reverse('admin:posts_post_changelist'),
+                              {'q': 'котики'})
+        self.assertEqual(list(response.context['cl'].result_list),
+                         [self.best])
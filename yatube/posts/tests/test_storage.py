@@ -0,0 +1,101 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from core.views import serve_media
+from posts.models import ImageBlob, Post
+from posts.storage import ContentAddressedStorage
+from posts.tests.test_thumbnails import image_file
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+User = get_user_model()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_same_content_stored_once(self):
+        """Одинаковое содержимое хранится в одном файле"""
+        storage = ContentAddressedStorage()
+        first = storage.save('posts/one.PNG', ContentFile(b'content'))
+        second = storage.save('posts/two.png', ContentFile(b'content'))
+        other = storage.save('posts/one.png', ContentFile(b'other'))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertRegex(first, r'^posts/[0-9a-f]{2}/[0-9a-f]{64}\.png$')
+        directory = os.path.dirname(storage.path(first))
+        self.assertEqual(os.listdir(directory), [os.path.basename(first)])
+
+    def test_posts_count_references(self):
+        """Посты считают ссылки на общий файл картинки"""
+        first = Post.objects.create(author=self.author, text='Первый',
+                                    image=image_file('one.png'))
+        second = Post.objects.create(author=self.author, text='Второй',
+                                     image=image_file('two.png'))
+        self.assertEqual(first.image.name, second.image.name)
+        blob = ImageBlob.objects.get(name=first.image.name)
+        self.assertEqual(blob.references, 2)
+        first.delete()
+        second.image = None
+        second.save()
+        blob.refresh_from_db()
+        self.assertEqual(blob.references, 0)
+        self.assertIsNotNone(blob.released)
+
+    def test_prune_keeps_referenced_and_recent_files(self):
+        """prune_images удаляет только давно не используемые файлы"""
+        post = Post.objects.create(author=self.author, text='Текст',
+                                   image=image_file())
+        path = post.image.path
+        post.delete()
+        call_command('prune_images', stdout=open(os.devnull, 'w'))
+        self.assertTrue(os.path.exists(path))
+        self.age_blob(path)
+        call_command('prune_images', stdout=open(os.devnull, 'w'))
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(ImageBlob.objects.exists())
+
+    def age_blob(self, path):
+        """Файл загружен и освобождён двое суток назад."""
+        released = ImageBlob.objects.get().released - timedelta(days=2)
+        ImageBlob.objects.update(released=released)
+        uploaded = released.timestamp() - 60
+        os.utime(path, (uploaded, uploaded))
+
+    def test_prune_keeps_file_uploaded_again(self):
+        """Файл, загруженный снова во время prune_images, не удаляется"""
+        post = Post.objects.create(author=self.author, text='Текст',
+                                   image=image_file())
+        path = post.image.path
+        post.delete()
+        self.age_blob(path)
+        # Та же картинка загружена снова, пост с ней ещё не сохранён
+        ContentAddressedStorage().save('posts/image.png', image_file())
+        call_command('prune_images', stdout=open(os.devnull, 'w'))
+        self.assertTrue(os.path.exists(path))
+        blob = ImageBlob.objects.get()
+        self.assertEqual(blob.references, 0)
+        self.assertIsNotNone(blob.released)
+
+    def test_content_addressed_media_is_immutable(self):
+        """Файлы с хешем в имени отдаются с бессрочным кэшированием"""
+        name = ContentAddressedStorage().save('posts/image.png',
+                                              ContentFile(b'content'))
+        request = RequestFactory().get(f'/media/{name}')
+        response = serve_media(request, name, document_root=TEMP_MEDIA_ROOT)
+        self.assertIn('immutable', response['Cache-Control'])
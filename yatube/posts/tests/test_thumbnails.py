@@ -0,0 +1,129 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from posts import thumbnails
+from posts.models import Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+User = get_user_model()
+
+
+def image_file(name='image.png', color=(255, 0, 0)):
+    content = BytesIO()
+    Image.new('RGB', (40, 20), color).save(content, 'png')
+    return SimpleUploadedFile(name, content.getvalue(),
+                              content_type='image/png')
+
+
+def scheduled(callbacks):
+    return [callback for callback in callbacks
+            if getattr(callback, 'func', None) is thumbnails.schedule]
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_THUMBNAIL_WORKERS=0)
+class ThumbnailsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def ready(self, post):
+        return thumbnails.ready_thumbnails([post.image])[post.image.name]
+
+    def test_placeholder_until_thumbnail_is_ready(self):
+        """До создания вариантов страницы показывают заглушку"""
+        post = Post.objects.create(author=self.author, text='Текст',
+                                   image=image_file())
+        self.assertEqual(self.ready(post), {})
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'img/placeholder.svg')
+        thumbnails.schedule(post)
+        ready = self.ready(post)
+        self.assertTrue(thumbnails.is_complete(ready))
+        for url in (reverse('posts:index'),
+                    reverse('posts:post_detail', kwargs={'post_id': post.id})):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                for thumbnail in ready.values():
+                    self.assertContains(response, thumbnail.url)
+                self.assertNotContains(response, 'img/placeholder.svg')
+
+    @override_settings(POST_IMAGE_WIDTHS=(320, 960),
+                       POST_IMAGE_FORMATS=('PNG', 'JPEG'))
+    def test_variants_srcset(self):
+        """Варианты всех ширин и форматов выводятся в srcset"""
+        post = Post.objects.create(author=self.author, text='Текст',
+                                   image=image_file())
+        thumbnails.generate(post.image.name)
+        ready = self.ready(post)
+        self.assertEqual(sorted(ready),
+                         ['320.jpeg', '320.png', '960.jpeg', '960.png'])
+        for name, thumbnail in ready.items():
+            with self.subTest(variant=name):
+                self.assertTrue(thumbnail.name.startswith(
+                    os.path.splitext(post.image.name)[0] + '_'))
+                self.assertEqual(thumbnail.width, int(name.split('.')[0]))
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.id}))
+        self.assertContains(
+            response,
+            '<source type="image/png" srcset="{} 320w, {} 960w"'.format(
+                ready['320.png'].url, ready['960.png'].url))
+        self.assertContains(response, 'src="{}"'.format(
+            ready['960.jpeg'].url))
+
+    def test_saving_image_schedules_generation(self):
+        """Варианты создаются после фиксации транзакции с картинкой"""
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            post = Post.objects.create(author=self.author, text='Текст',
+                                       image=image_file())
+        self.assertEqual(len(scheduled(callbacks)), 1)
+        self.assertTrue(thumbnails.is_complete(self.ready(post)))
+        with self.captureOnCommitCallbacks() as callbacks:
+            post.text = 'Правка без новой картинки'
+            post.save()
+        self.assertEqual(scheduled(callbacks), [])
+
+    def test_page_thumbnails_resolved_in_one_query(self):
+        """Варианты картинок страницы находятся одним запросом"""
+        posts = [Post.objects.create(author=self.author, text=f'Текст {num}',
+                                     image=image_file(color=(num, 0, 0)))
+                 for num in range(5)]
+        for post in posts[:3]:
+            thumbnails.generate(post.image.name)
+        cache.clear()
+        with self.assertNumQueries(1):
+            ready = thumbnails.ready_thumbnails(
+                [post.image for post in posts])
+        self.assertEqual(
+            [thumbnails.is_complete(ready[post.image.name])
+             for post in posts],
+            [True, True, True, False, False])
+
+    def test_generate_thumbnails_command(self):
+        """Команда создаёт варианты для уже загруженных картинок"""
+        post = Post.objects.create(author=self.author, text='Текст',
+                                   image=image_file())
+        out = StringIO()
+        call_command('generate_thumbnails', stdout=out)
+        self.assertIn('для 1 картинок', out.getvalue())
+        self.assertTrue(thumbnails.is_complete(self.ready(post)))
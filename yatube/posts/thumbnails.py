@@ -0,0 +1,238 @@
+"""
+ Адаптивные варианты картинок постов.
+
+ Для каждой картинки создаются варианты всех ширин POST_IMAGE_WIDTHS
+ в каждом из форматов POST_IMAGE_FORMATS (WebP — если Pillow его
+ поддерживает, и запасной JPEG). Варианты лежат рядом с оригиналом в
+ MEDIA_ROOT/posts/ и создаются после сохранения поста в пуле из
+ POST_THUMBNAIL_WORKERS процессов, а не при отрисовке. Шаблоны берут
+ только готовые варианты (ready_thumbnails) и до их появления
+ показывают заглушку. Для старых картинок варианты создаёт команда
+ generate_thumbnails.
+"""
+
+import logging
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from django.conf import settings
+from PIL import features
+from sorl.thumbnail import default
+from sorl.thumbnail.base import EXTENSIONS, ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.helpers import serialize, tokey
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore
+
+from . import page_cache
+
+logger = logging.getLogger(__name__)
+
+Variant = namedtuple('Variant',
+                     'name width height format geometry options')
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class PostThumbnailBackend(ThumbnailBackend):
+    def thumbnail_file(self, file_, geometry_string, **options):
+        """
+        Файл миниатюры с тем же именем, что даёт get_thumbnail.
+
+        Параметры дополняются так же, как в ThumbnailBackend.get_thumbnail.
+        """
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def _get_thumbnail_filename(self, source, geometry_string, options):
+        """Вариант лежит рядом с оригиналом: posts/photo_640x226_<хеш>.webp"""
+        key = tokey(source.key, geometry_string, serialize(options))
+        stem = os.path.splitext(source.name)[0]
+        extension = EXTENSIONS[options['format']]
+        return f'{stem}_{geometry_string}_{key[:12]}.{extension}'
+
+
+backend = PostThumbnailBackend()
+
+
+def variants():
+    """Варианты картинки: сначала предпочтительные форматы, по ширинам."""
+    aspect_width, aspect_height = settings.POST_IMAGE_ASPECT
+    formats = [image_format for image_format in settings.POST_IMAGE_FORMATS
+               if image_format != 'WEBP' or features.check('webp')]
+    sizes = [(width, round(width * aspect_height / aspect_width))
+             for width in settings.POST_IMAGE_WIDTHS]
+    return [
+        Variant(name=f'{width}.{image_format.lower()}',
+                width=width,
+                height=height,
+                format=image_format,
+                geometry=f'{width}x{height}',
+                options={'crop': 'center', 'upscale': True,
+                         'format': image_format,
+                         'quality': settings.POST_IMAGE_QUALITY})
+        for image_format in formats
+        for width, height in sizes]
+
+
+def thumbnail_key(file_, variant):
+    """
+    Ключ хранилища sorl для варианта картинки.
+
+    Картинка передаётся именем, как в generate: ключ sorl зависит и от
+    хранилища файла, а у поля Post.image оно своё.
+    """
+    thumbnail = backend.thumbnail_file(str(file_), variant.geometry,
+                                       **variant.options)
+    return add_prefix(thumbnail.key)
+
+
+def ready_thumbnails(files):
+    """
+    Готовые варианты картинок files: {имя картинки: {вариант: файл}}.
+
+    Все варианты ищутся одним get_many в кэше и одним запросом к
+    хранилищу sorl для промахов. В отличие от тега {% thumbnail %}
+    ничего не создаёт и не кэширует отсутствие варианта: его может
+    создать другой процесс.
+    """
+    keys = {}
+    for file_ in files:
+        if file_:
+            for variant in variants():
+                keys[thumbnail_key(file_, variant)] = (str(file_),
+                                                       variant.name)
+    kv_cache = default.kvstore.cache
+    values = {key: value for key, value in kv_cache.get_many(keys).items()
+              if isinstance(value, str)}
+    missing = [key for key in keys if key not in values]
+    if missing:
+        found = dict(KVStore.objects.filter(key__in=missing)
+                     .values_list('key', 'value'))
+        kv_cache.set_many(found, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT)
+        values.update(found)
+    ready = {name: {} for name, _ in keys.values()}
+    for key, value in values.items():
+        name, variant_name = keys[key]
+        ready[name][variant_name] = deserialize_image_file(value)
+    return ready
+
+
+def is_complete(ready):
+    """Готовы ли все варианты картинки."""
+    return len(ready) == len(variants())
+
+
+def generate(name):
+    """Создаёт все варианты картинки name; готовые пропускает."""
+    for variant in variants():
+        backend.get_thumbnail(name, variant.geometry, **variant.options)
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def _generate_safely(name):
+    try:
+        generate(name)
+    except Exception as error:
+        logger.error('Не удалось создать миниатюры %s', name, exc_info=error)
+        return False
+    return True
+
+
+def make_pool(workers):
+    return ProcessPoolExecutor(max_workers=workers,
+                               mp_context=get_context('spawn'),
+                               initializer=_init_worker)
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = make_pool(settings.POST_THUMBNAIL_WORKERS)
+        return _pool
+
+
+def _submit(name):
+    """Отправляет задачу в пул; сломанный пул один раз пересоздаётся."""
+    global _pool
+    for _ in range(2):
+        pool = _get_pool()
+        try:
+            return pool.submit(_generate_safely, name)
+        except RuntimeError as error:
+            # BrokenProcessPool: процесс пула завершился аварийно
+            logger.warning('Пул миниатюр недоступен: %s', error)
+            with _pool_lock:
+                if _pool is pool:
+                    _pool = None
+    return None
+
+
+def post_scopes(post_id, author_id, group_id):
+    """Области кэша страниц, где видна картинка поста."""
+    scopes = [page_cache.ALL_POSTS_SCOPE,
+              page_cache.post_scope(post_id),
+              page_cache.author_scope(author_id)]
+    if group_id is not None:
+        scopes.append(page_cache.group_scope(group_id))
+    return scopes
+
+
+def generate_many(names, pool=None):
+    """
+    Создаёт миниатюры картинок names, в пуле pool или в этом процессе.
+
+    Возвращает пары (картинка, удалось ли создать миниатюры).
+    """
+    if pool is None:
+        return ((name, _generate_safely(name)) for name in names)
+    names = list(names)
+    return zip(names, pool.map(_generate_safely, names))
+
+
+def schedule(post):
+    """
+    Ставит создание миниатюр картинки поста в очередь пула.
+
+    Когда миниатюры готовы, страницы с заглушкой сбрасываются.
+    """
+    name = post.image.name
+    scopes = post_scopes(post.pk, post.author_id, post.group_id)
+    if not settings.POST_THUMBNAIL_WORKERS:
+        if _generate_safely(name):
+            page_cache.bump(*scopes)
+        return
+
+    def done(future):
+        error = future.exception()
+        if error is not None:
+            logger.error('Не удалось создать миниатюры %s', name,
+                         exc_info=error)
+        elif future.result():
+            page_cache.bump(*scopes)
+
+    future = _submit(name)
+    if future is None:
+        logger.error('Миниатюры %s не поставлены в очередь', name)
+        return
+    future.add_done_callback(done)
@@ -1,67 +1,155 @@
+from collections import defaultdict
+
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Q
+from django.http import HttpResponseForbidden
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse_lazy
-from django.views.decorators.cache import cache_page
 from django.views.generic.edit import CreateView
 
+from . import counters, counts, feeds, page_cache, search
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
-
-
-@cache_page(20, key_prefix='index_page')
+from .models import Comment, Follow, Group, Post, User
+from .paginators import CursorPaginator, paginate
+
+
+def add_comment_previews(page_obj):
+    """
+    Добавляет постам страницы последние комментарии для карточек.
+
+    В post.latest_comments попадают POST_CARD_COMMENTS новых комментариев
+    с авторами: для всей страницы это один запрос, сколько бы постов на
+    ней ни было. Для каждого поста страницы — свой подзапрос с LIMIT по
+    индексу (post, -created, -id), поэтому работа не зависит от числа
+    комментариев у поста. Количество комментариев берётся из счётчика
+    Post.comments_count.
+    """
+    posts = list(page_obj.object_list)
+    page_obj.object_list = posts
+    if not posts:
+        return page_obj
+    condition = Q()
+    for post in posts:
+        condition |= Q(id__in=Comment.objects.filter(post_id=post.pk)
+                       .order_by('-created', '-id')
+                       .values('id')[:settings.POST_CARD_COMMENTS])
+    previews = defaultdict(list)
+    for comment in (Comment.objects.filter(condition)
+                    .select_related('author').order_by('-created', '-id')):
+        previews[comment.post_id].append(comment)
+    for post in posts:
+        post.latest_comments = previews[post.pk]
+    return page_obj
+
+
+@page_cache.versioned_cache_page
 def index(request):
+    page_cache.depends_on(request, page_cache.ALL_POSTS_SCOPE,
+                          page_cache.GROUPS_SCOPE, page_cache.USERS_SCOPE)
     posts = Post.objects.select_related('group', 'author').all()
-    paginator = Paginator(posts, settings.POST_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = add_comment_previews(
+        paginate(request, posts, count_key=counts.ALL_POSTS_KEY))
+    page_cache.depends_on_posts(request, page_obj)
     context = {'page_obj': page_obj}
     return render(request, 'posts/index.html', context)
 
 
+@page_cache.versioned_cache_page
 def group_posts(request, slug):
+    page_cache.depends_on(request, page_cache.USERS_SCOPE)
     group = get_object_or_404(Group, slug=slug)
+    page_cache.depends_on(request, page_cache.group_scope(group.id))
     posts = group.posts.select_related('group', 'author').all()
-    paginator = Paginator(posts, settings.POST_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = add_comment_previews(
+        paginate(request, posts, count_key=counts.group_posts_key(group.id)))
+    page_cache.depends_on_posts(request, page_obj)
     context = {
         'group': group,
         'page_obj': page_obj}
     return render(request, 'posts/group_list.html', context)
 
 
+@page_cache.versioned_cache_page
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.select_related('author').all()
+    page_cache.depends_on(request, page_cache.GROUPS_SCOPE,
+                          page_cache.USERS_SCOPE)
+    author = get_object_or_404(User.objects.select_related('stats'),
+                               username=username)
+    page_cache.depends_on(request, page_cache.author_scope(author.id))
+    stats = counters.get_user_stats(author)
+    posts = author.posts.select_related('author', 'group').all()
     following = False
     if request.user.is_authenticated:
         following = Follow.objects.filter(user=request.user,
                                           author=author).exists()
-    paginator = Paginator(posts, settings.POST_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = add_comment_previews(
+        paginate(request, posts,
+                 count_key=counts.author_posts_key(author.id)))
+    page_cache.depends_on_posts(request, page_obj)
     context = {
         'author': author,
-        'posts_count': posts.count(),
+        'posts_count': stats.posts_count,
+        'followers_count': stats.followers_count,
+        'following_count': stats.following_count,
         'following': following,
         'page_obj': page_obj}
     return render(request, 'posts/profile.html', context)
 
 
+@page_cache.versioned_cache_page
 def post_detail(request, post_id):
-    post = Post.objects.select_related('group', 'author').get(id=post_id)
-    posts_count = post.author.posts.count()
+    page_cache.depends_on(request, page_cache.post_scope(post_id),
+                          page_cache.GROUPS_SCOPE, page_cache.USERS_SCOPE)
+    post = Post.objects.select_related(
+        'group', 'author', 'author__stats').get(id=post_id)
+    page_cache.depends_on(request, page_cache.author_scope(post.author_id))
+    posts_count = counters.get_user_stats(post.author).posts_count
     form = CommentForm()
-    comments = post.comments.all()
     context = {'post': post,
                'posts_count': posts_count,
                'form': form,
-               'comments': comments}
+               'comments': comment_page(request, post.id)}
     return render(request, 'posts/post_detail.html', context)
 
 
+def comment_page(request, post_id):
+    """Страница комментариев поста от новых к старым по курсору ?after=."""
+    comments = (Comment.objects.filter(post_id=post_id)
+                .select_related('author').order_by('-created', '-id'))
+    paginator = CursorPaginator(comments, settings.COMMENTS_PER_PAGE,
+                                key=('created', 'id'))
+    return paginator.page_after(request.GET.get('after'))
+
+
+@page_cache.versioned_cache_page
+def post_comments(request, post_id):
+    """
+    Фрагмент HTML со следующей страницей комментариев поста.
+
+    Комментарии, как и на странице поста, видны только пользователям.
+    Гость получает 403, а не перенаправление на вход: вместо фрагмента
+    пришла бы целая страница.
+    """
+    if not request.user.is_authenticated:
+        return HttpResponseForbidden()
+    page_cache.depends_on(request, page_cache.post_scope(post_id),
+                          page_cache.USERS_SCOPE)
+    context = {'post_id': post_id,
+               'comments': comment_page(request, post_id)}
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
+def post_search(request):
+    query = request.GET.get('q', '').strip()
+    paginator = search.SearchPaginator(query, settings.POST_PER_PAGE)
+    page_obj = paginator.get_cursor_page(after=request.GET.get('after'),
+                                         before=request.GET.get('before'))
+    context = {'query': query, 'page_obj': page_obj}
+    return render(request, 'posts/search.html', context)
+
+
 class PostView(CreateView):
     form_class = PostForm
     template_name = 'posts/create_post.html'
@@ -81,7 +169,8 @@ def post_create(request):
     if request.method == 'POST' and form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
-        post.save()
+        with transaction.atomic():
+            post.save()
         return redirect('posts:profile', post.author)
     return render(request, 'posts/create_post.html', context)
 
@@ -112,16 +201,17 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with transaction.atomic():
+            comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(posts, settings.POST_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = add_comment_previews(
+        paginate(request, feeds.user_feed(request.user),
+                 count_key=counts.follow_posts_key(request.user.id),
+                 cursor_key=feeds.CURSOR_KEY))
     context = {'page_obj': page_obj}
     return render(request, 'posts/follow.html', context)
 
@@ -130,12 +220,14 @@ def follow_index(request):
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if author != request.user:
-        Follow.objects.get_or_create(user=request.user, author=author)
+        with transaction.atomic():
+            Follow.objects.get_or_create(user=request.user, author=author)
     return redirect('posts:profile', username=author.username)
 
 
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    Follow.objects.filter(user=request.user, author=author).delete()
+    with transaction.atomic():
+        Follow.objects.filter(user=request.user, author=author).delete()
     return redirect('posts:profile', username=author.username)
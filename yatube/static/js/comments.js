@@ -0,0 +1,26 @@
+// Догружает более ранние комментарии фрагментом вместо перехода
+document.addEventListener('click', function (event) {
+  var link = event.target.closest('[data-comments-fragment]');
+  if (!link) {
+    return;
+  }
+  event.preventDefault();
+  fetch(link.dataset.commentsFragment, {credentials: 'same-origin'})
+    .then(function (response) {
+      // Перенаправление (например, на вход) вернуло бы целую страницу
+      if (!response.ok || response.redirected) {
+        throw new Error(response.statusText);
+      }
+      return response.text();
+    })
+    .then(function (html) {
+      if (/<html/i.test(html)) {
+        throw new Error('not a fragment');
+      }
+      link.insertAdjacentHTML('afterend', html);
+      link.remove();
+    })
+    .catch(function () {
+      window.location = link.href;
+    });
+});
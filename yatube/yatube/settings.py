@@ -47,11 +47,15 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
 ]
 
 MIDDLEWARE = [
     'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.QueryBudgetMiddleware',
+    'core.middleware.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -65,7 +69,7 @@ ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backends.InstrumentedDjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -93,6 +97,21 @@ DATABASES = {
     }
 }
 
+# Реплики для чтения (см. core/db_router.py). Для проверки на своей
+# машине укажите в YATUBE_REPLICAS пути к файлам SQLite через запятую и
+# заполните их командой sync_replicas
+REPLICA_DATABASES = []
+for number, path in enumerate(
+        filter(None, os.environ.get('YATUBE_REPLICAS', '').split(',')), 1):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path,
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -154,9 +173,126 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 # User variables
 POST_PER_PAGE = 10
-
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+# Комментариев на странице поста и в каждой догружаемой части
+COMMENTS_PER_PAGE = 20
+# Последних комментариев в карточке поста в лентах
+POST_CARD_COMMENTS = 2
+# Режим пагинации лент (главная, группа, профиль, подписки) без
+# параметров: 'page' (по номеру) или 'cursor'. ?page= и ?after= задают
+# режим явно. Лента подписок с авторами, чьи посты выбираются при
+# чтении, всегда листается по курсору
+POST_PAGINATION = 'page'
+# С этой страницы ссылка «Следующая» переходит на вывод по курсору
+POST_CURSOR_FROM_PAGE = 5
+# Время жизни кэша количества постов в лентах, сек.
+POST_COUNT_CACHE_TIMEOUT = 60 * 60
+# Время жизни страниц в кэше с версиями (см. posts/page_cache.py), сек.
+PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+# Время жизни карточек постов в кэше (см. posts/templatetags/post_cards.py)
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+# Адаптивные варианты картинок постов (см. posts/thumbnails.py):
+# ширины, форматы по предпочтению (последний — запасной для <img>),
+# пропорции кадра, качество сжатия и атрибут sizes для srcset.
+# Создаются в фоне после сохранения поста
+POST_IMAGE_WIDTHS = (320, 640, 960)
+POST_IMAGE_FORMATS = ('WEBP', 'JPEG')
+POST_IMAGE_ASPECT = (960, 339)
+POST_IMAGE_QUALITY = 80
+POST_IMAGE_SIZES = '(max-width: 960px) 100vw, 960px'
+# Процессов для создания миниатюр; 0 — создавать сразу после сохранения
+POST_THUMBNAIL_WORKERS = 2
+# До скольких записей считать отфильтрованный список постов в админке
+ADMIN_COUNT_LIMIT = 10000
+# Время жизни границ страниц списка постов в админке, сек.
+ADMIN_BOUNDARY_CACHE_TIMEOUT = 60 * 10
+# Наибольший размер страницы ленты в API (?limit=)
+API_MAX_PAGE_SIZE = 100
+# Строк за одно чтение из базы при выгрузке (см. posts/export.py)
+EXPORT_CHUNK_SIZE = 2000
+# Сколько последних постов автора добавлять в ленту при подписке
+FEED_BACKFILL_LIMIT = 1000
+# Размер пачки при записи в ленты подписок
+FEED_BATCH_SIZE = 1000
+# Посты авторов с большим числом подписчиков не раскладываются по лентам,
+# а выбираются при чтении
+FEED_PULL_FOLLOWER_THRESHOLD = 10000
+# Представления, которые могут читать с реплик
+REPLICA_VIEWS = (
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:post_comments',
+    'posts:follow_index',
+    'api:post_list',
+    'api:post_item',
+    'api:group_feed',
+    'api:author_feed',
+    'api:follow_feed',
+)
+# Сколько секунд после записи пользователь читает только основную базу
+REPLICA_STICKY_SECONDS = 5
+REPLICA_PIN_COOKIE = 'primary_pin'
+# Реплика, отстающая больше чем на столько секунд, не используется
+REPLICA_MAX_LAG = 2
+# Как часто проверять задержку реплик, сек.
+REPLICA_LAG_CHECK_INTERVAL = 1
+
+# Бюджет SQL-запросов на представление (см. core/query_budget.py)
+QUERY_BUDGET_DEFAULT = 20
+QUERY_BUDGETS = {
+    'posts:index': 6,
+    'posts:group_list': 6,
+    'posts:profile': 8,
+    'posts:post_detail': 5,
+    'posts:follow_index': 7,
+    'posts:post_create': 4,
+    'posts:post_edit': 5,
+    # Запись: пост, счётчики автора, лента подписчиков и ссылки
+    # на картинку
+    'POST posts:post_create': 20,
+    'POST posts:post_edit': 12,
+    'posts:search': 4,
+    'posts:post_comments': 4,
+    # Вместе с запросами сессии и пользователя, как у страниц
+    'api:post_list': 4,
+    'api:group_feed': 5,
+    'api:author_feed': 5,
+    'api:post_item': 5,
+    'api:follow_feed': 5,
 }
+# Сколько одинаковых по форме запросов считать N+1
+QUERY_BUDGET_REPEAT_THRESHOLD = 3
+# В строгом режиме нарушения бюджета вызывают исключение.
+# Тесты всегда идут в строгом режиме (см. core/test_runner.py)
+QUERY_BUDGET_STRICT = False
+TEST_RUNNER = 'core.test_runner.StrictBudgetRunner'
+
+# Метрики Prometheus (см. core/metrics.py). Для нескольких процессов
+# укажите общий каталог METRICS_DIR
+METRICS_DIR = None
+METRICS_FLUSH_INTERVAL = 5
+# Кроме персонала /metrics/ открыт только с заголовком
+# Authorization: Bearer <METRICS_TOKEN>. Адрес клиента не проверяется:
+# за локальным прокси у всех запросов он 127.0.0.1
+METRICS_TOKEN = os.environ.get('YATUBE_METRICS_TOKEN')
+
+# Версии страниц и счётчики лент сбрасываются в кэше, поэтому кэш должен
+# быть общим для всех процессов: укажите каталог YATUBE_CACHE_DIR или
+# другой общий бэкенд (проверка core.W001 в check --deploy). В кэше
+# памяти процесса эти записи живут не дольше LOCAL_CACHE_TIMEOUT, сек.
+CACHE_DIR = os.environ.get('YATUBE_CACHE_DIR')
+LOCAL_CACHE_TIMEOUT = 60
+if CACHE_DIR:
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.InstrumentedFileBasedCache',
+            'LOCATION': CACHE_DIR,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.InstrumentedLocMemCache',
+        }
+    }